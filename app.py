@@ -1,124 +1,68 @@
-from kivymd.uix.screen import MDScreen
 from kivymd.app import MDApp
-from kivy.uix.screenmanager import ScreenManager
 from kivy.lang import Builder
-
-from kivymd.uix.toolbar import MDTopAppBar
-from kivymd.uix.button import (
-	MDFlatButton,
-	MDRaisedButton,
-	MDIconButton,
-	MDRectangleFlatButton,
-	MDFillRoundFlatButton,
-	MDTextButton
-)
-from kivymd.uix.label import MDLabel
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.gridlayout import MDGridLayout
-from kivymd.uix.boxlayout import MDBoxLayout
-
-from kivy.uix.label import Label as KivyLabel
-
-from kivy.metrics import dp, sp
-
-from kivy.core.window import Window
-# Window.size = (1000, 600)
-
-import glob
-import pandas as pd
+from kivy.factory import Factory
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.properties import ObjectProperty
+
+import argparse
+import threading
+import importlib
 import datetime as dt
 import calendar
-import numpy as np
-
-from kivy.properties import (
-	NumericProperty,
-	OptionProperty,
-	ObjectProperty,
-	StringProperty,
-	ListProperty,
-	BooleanProperty,
-	VariableListProperty,
-	ReferenceListProperty
-)
 
 from typing import Union
 from functools import partial
 
-from graph import PlotWidget, DonutPlot
-from graphscreen import GraphScreen
-from datascreen import DataScreen
-from homescreen import HomeScreen
-
+from profiling import profiler, timed, interaction
 
+# Heavy modules (pandas, matplotlib and the screens other than Home)
+# are imported the first time they are needed, not on startup.
+# HomeScreen is imported so that layout.kv can create it.
+from homescreen import HomeScreen
+Factory.register("PlotWidget", module = "graph")
+Factory.register("DonutPlot", module = "graph")
+Factory.register("CanvasPlot", module = "canvasplot")
 
-class Dataset(pd.DataFrame):
-	pass
 
-	
-def get_daily_data(dataset: pd.DataFrame)-> pd.DataFrame:
-	return dataset.drop_duplicates(subset=['date'], keep='last')[::-1]
+# Screen classes by name as "module.Class", see MainApp.show_screen
+SCREENS = {
+	"Home"   : "homescreen.HomeScreen",
+	"Graphs" : "graphscreen.GraphScreen",
+	"Data"   : "datascreen.DataScreen",
+}
 
-def get_data_of_month(dataset: pd.DataFrame, month: str) -> pd.DataFrame:
-	month_num = str(list(calendar.month_name).index(month))
-	if len(month_num) < 2: month_num = '0' + month_num
-	return dataset['Date']
 
+class MainApp(MDApp):
 
+	screen_manager = ObjectProperty(None)
 
+	dataset = ObjectProperty(None, allownone = True)
+	'''Cleaned transactions oldest first, None until loaded'''
 
-class MainApp(MDApp):
+	each_day = ObjectProperty(None, allownone = True)
+	'''Last transaction of each day, None until loaded'''
 
-	screen_manager = ObjectProperty(None)
+	store = ObjectProperty(None, allownone = True)
+	'''Transactions indexed by date, see store.TransactionStore'''
 
 	def __init__(self, *args, **kwargs):
 		self.screen_manager = kwargs.pop("screen_manager", None)
 		super().__init__(*args, **kwargs)	
+		self.register_event_type('on_dataset_ready')
+		self.register_event_type('on_dataset_update')
+		self.database = None
+		self.watcher = None
 
 
-	@staticmethod
-	def load_dataset() -> pd.DataFrame:
-		'''Load all csv files in the data folder and combine dataframes'''
-		datafiles = glob.glob("data/*.csv")
-		dataframes = [pd.read_csv(file) for file in datafiles]
-		dataset = pd.concat(dataframes)
-		return dataset
-
-
-	def cleanup_dataset(self):
-		# simplify column names
-		names = {
-			'Transaction Date' : 'date',
-			'Balance'          : 'balance',
-			'Debit Amount'     : 'expense',
-			'Credit Amount'    : 'income'
-		}
-		self.dataset = self.dataset.rename(names, axis='columns')
-
-		# generate datetime objects
-		self.dataset['datetime'] = [
-			dt.datetime.strptime(d,"%d/%m/%Y")
-			for d in self.dataset['date'] ]
-
-		# extract inidividual date components
-		month_nums = [date.month for date in self.dataset['datetime']]
-		month_names = [ calendar.month_name[n] for n in month_nums]
-		self.dataset['month'] = month_names
-		self.dataset['day']  = [date.day  for date in self.dataset['datetime']]
-		self.dataset['year'] = [date.year for date in self.dataset['datetime']]
-
-		# extract weekdays names
-		weekday_nums = [date.weekday() for date in self.dataset['datetime']]
-		weekday_names = [calendar.day_name[n] for n in weekday_nums]
-		self.dataset['weekday'] = weekday_names
-
-		# calculate transaction amounts (negative is expense, positive is income)
-		debit  = self.dataset['expense']
-		credit = self.dataset['income'] 
-		self.dataset['amount'] = [-d if not np.isnan(d) else c for c,d in zip(credit,debit)]
-
-		self.dataset['expense'].fillna(0.0, inplace=True)
-		self.dataset['income'].fillna(0.0, inplace=True)
-
+	@timed("app.load_dataset")
+	def load_dataset(self):
+		'''Import new csv files into the database and load every transaction'''
+		import dataset
+		from database import TransactionDatabase
+		self.database = TransactionDatabase()
+		self.database.import_folder(dataset.DATA_DIR)
+		return self.database.load()
 
 
 	@staticmethod
@@ -126,30 +70,83 @@ class MainApp(MDApp):
 		if isinstance(amount,str): return '£'+amount
 		return f"£{amount:,.2f}"
 
-	def build(self):
-
-		self.theme_cls.primary_palette = "Blue"
-
-		self.dataset = MainApp.load_dataset()
-		self.cleanup_dataset()
-
-		self.each_day = self.dataset.drop_duplicates(subset=['date'], keep='last')[::-1]
-
+	def load_in_background(self):
+		'''Loads the dataset on a worker thread and hands it to the UI thread'''
+		try:
+			# csv files are cleaned and deduplicated as they are imported
+			data = self.load_dataset()
+			from store import TransactionStore
+			with timed("app.build_store"):
+				store = TransactionStore(data)
+		except Exception as error:
+			Logger.exception("MainApp: could not load the dataset")
+			Clock.schedule_once(partial(self.show_load_error, error), 0)
+			return
+		Clock.schedule_once(partial(self.set_dataset, store), 0)
+
+	def start_loading(self):
+		'''Loads the dataset on a worker thread, see load_in_background'''
+		self.loader = threading.Thread(target = self.load_in_background, daemon = True)
+		self.loader.start()
+
+	def show_load_error(self, error: Exception, *largs):
+		'''Tells that the dataset couldn't be loaded, offering to try again'''
+		from kivymd.uix.dialog import MDDialog
+		from kivymd.uix.button import MDFlatButton, MDRaisedButton
+
+		def retry(*largs):
+			dialog.dismiss()
+			self.start_loading()
+
+		dialog = MDDialog(
+			title = "Could not load the transactions",
+			text = f"{type(error).__name__}: {error}",
+			auto_dismiss = False,
+			buttons = [
+				MDFlatButton(text="QUIT", on_release=lambda *largs: self.stop()),
+				MDRaisedButton(text="RETRY", on_release=retry),
+			],
+		)
+		dialog.open()
+
+	def set_dataset(self, store, *largs):
+		'''Makes a loaded dataset available to the screens'''
+		self.store = store
+		self.each_day = store.each_day
+		self.dataset = store.data
+		self.update_summary()
+		self.dispatch('on_dataset_ready')
+
+		# exports saved into the data folder from now on are added as they appear
+		from watcher import DataFolderWatcher
+		self.watcher = DataFolderWatcher(self.database, self.add_transactions)
+		self.watcher.start()
+
+	def add_transactions(self, new_rows):
+		'''Adds transactions imported while the app is running'''
+		with timed("app.append_transactions"):
+			self.store.append(new_rows)
+		self.each_day = self.store.each_day
+		self.dataset = self.store.data
+		self.update_summary()
+		self.dispatch('on_dataset_update')
+
+	@timed("app.summary")
+	def update_summary(self):
+		'''Computes the figures of last month'''
 		self.this_year = dt.datetime.now().year
 		last_month_num = dt.datetime.now().month - 1
 		if last_month_num == 0:
 			last_month_num = 12
 			self.this_year -= 1
 		self.last_month = calendar.month_name[last_month_num]
-		self.this_year = str(self.this_year)
 
-		time_idx = self.dataset['month'] == self.last_month
-		time_idx &= int(self.this_year) == self.dataset['year']
+		last_month = self.store.summary.get(self.this_year, last_month_num)
+		self.this_year = str(self.this_year)
 
-		balances_row = self.dataset['balance'][time_idx]
-		self.balance = 0 if balances_row.shape[0] == 0 else balances_row.iloc[0]
-		self.expenses = self.dataset[time_idx]['expense'].sum()
-		self.income = self.dataset[time_idx]['income'].sum()
+		self.balance = last_month['balance']
+		self.expenses = last_month['expense']
+		self.income = last_month['income']
 		self.profit = self.income - self.expenses
 
 		self.balance_text = MainApp.sterling(self.balance)
@@ -157,18 +154,72 @@ class MainApp(MDApp):
 		self.income_text =  MainApp.sterling(self.income)
 		self.profit_text =  MainApp.sterling(self.profit)
 
+	def on_dataset_ready(self, *largs):
+		'''Fired once the dataset has been loaded and the store is available'''
+		pass
+
+	def on_dataset_update(self, *largs):
+		'''Fired when new transactions have been added to the store'''
+		pass
+
+	def on_stop(self):
+		if self.watcher is not None:
+			self.watcher.stop()
+		profiler.stop_profile()
+
+	def build(self):
+
+		self.theme_cls.primary_palette = "Blue"
+
+		# The window is shown straight away with placeholders,
+		# and the screens are populated once the data has loaded.
+		self.start_loading()
+
 		# self.theme_cls.primary_palette = "BlueGray"
 		self.theme_str = "Light"
 		self.theme_cls.theme_style = self.theme_str
 
 		screen = Builder.load_file("layout.kv")
+		self.screen_manager = screen.ids.screen_manager
+		for child in self.screen_manager.screens:
+			self.connect_screen(child)
+
+		if profiler.enabled:
+			from perfoverlay import PerfOverlay
+			screen.add_widget(PerfOverlay())
 
 		return screen
 
+	def show_screen(self, name: str):
+		'''Switches to a screen, building it the first time it is shown'''
+		interaction(f"show {name}")
+		if not self.screen_manager.has_screen(name):
+			with timed("app.create_screen"):
+				module, cls = SCREENS[name].rsplit(".", 1)
+				screen_cls = getattr(importlib.import_module(module), cls)
+				screen = screen_cls()
+				self.connect_screen(screen)
+				self.screen_manager.add_widget(screen)
+		self.screen_manager.current = name
+
+	def connect_screen(self, screen):
+		'''Refreshes a screen when the dataset is loaded or changes'''
+		self.bind(
+			on_dataset_ready = screen.on_dataset_ready,
+			on_dataset_update = screen.on_dataset_ready)
+
 
 if __name__ == '__main__':
-	sm = ScreenManager()
-	sm.add_widget(HomeScreen(name="Home"))
-	sm.add_widget(GraphScreen(name="Graphs"))
-	sm.add_widget(DataScreen(name="Data"))
-	MainApp(screen_manager = sm).run()
+	# kivy reads the options before '--', e.g. python app.py -- --perf
+	parser = argparse.ArgumentParser(description = "Budget app")
+	parser.add_argument("--perf", action = "store_true",
+		help = "time the hot paths and show them over the app with the FPS")
+	parser.add_argument("--profile", metavar = "FILE",
+		help = "run cProfile on the UI thread and write its statistics to FILE on exit")
+	args = parser.parse_args()
+
+	if args.perf:
+		profiler.enable()
+	if args.profile:
+		profiler.start_profile(args.profile)
+	MainApp().run()
@@ -0,0 +1,68 @@
+'''
+Compares the per-row cleanup of bank exports against the vectorized one.
+
+	python benchmarks/bench_cleanup.py [rows ...]
+'''
+import os
+import sys
+import time
+import calendar
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dataset
+from synthetic import generate_bank_export
+
+
+def cleanup_dataset_rowwise(data: pd.DataFrame) -> pd.DataFrame:
+	'''Original implementation, kept as the reference for the benchmark'''
+	names = {
+		'Transaction Date' : 'date',
+		'Balance'          : 'balance',
+		'Debit Amount'     : 'expense',
+		'Credit Amount'    : 'income'
+	}
+	data = data.rename(names, axis='columns')
+	data['datetime'] = [
+		dt.datetime.strptime(d,"%d/%m/%Y")
+		for d in data['date'] ]
+	month_nums = [date.month for date in data['datetime']]
+	data['month'] = [ calendar.month_name[n] for n in month_nums]
+	data['day']  = [date.day  for date in data['datetime']]
+	data['year'] = [date.year for date in data['datetime']]
+	weekday_nums = [date.weekday() for date in data['datetime']]
+	data['weekday'] = [calendar.day_name[n] for n in weekday_nums]
+	debit  = data['expense']
+	credit = data['income']
+	data['amount'] = [-d if not np.isnan(d) else c for c,d in zip(credit,debit)]
+	data['expense'] = data['expense'].fillna(0.0)
+	data['income'] = data['income'].fillna(0.0)
+	return data
+
+
+def best_of(func, arg, repeat: int) -> float:
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func(arg.copy())
+		times.append(time.perf_counter() - start)
+	return min(times)
+
+
+def main(sizes):
+	print(f"{'rows':>10} {'row-wise (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+	for rows in sizes:
+		raw = generate_bank_export(rows)
+		repeat = 3 if rows < 1_000_000 else 1
+		old = best_of(cleanup_dataset_rowwise, raw, repeat)
+		new = best_of(dataset.cleanup_dataset, raw, repeat)
+		print(f"{rows:>10} {old:>14.4f} {new:>16.4f} {old/new:>8.1f}x")
+
+
+if __name__ == '__main__':
+	sizes = [int(n) for n in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+	main(sizes)
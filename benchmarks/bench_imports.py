@@ -0,0 +1,63 @@
+'''
+Reports the import cost of the app's modules using `python -X importtime`.
+Each module is imported in a fresh process. The slowest imports are listed,
+followed by the cumulative time of each of the app's own modules.
+
+	python benchmarks/bench_imports.py [module ...] [--top N]
+'''
+import os
+import sys
+import argparse
+import subprocess
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+APP_MODULES = [
+	"app", "homescreen", "graphscreen", "datascreen", "monthpicker",
+	"graph", "dataset", "database", "store",
+]
+
+
+def import_times(module: str) -> list:
+	'''Returns (self_us, cumulative_us, name) for each module imported'''
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+		cwd = ROOT, capture_output = True, text = True)
+	times = []
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "self [us]" in line:
+			continue
+		own, cumulative, name = line[len("import time:"):].split("|")
+		times.append((int(own), int(cumulative), name.rstrip()))
+	if result.returncode != 0:
+		print(result.stderr.splitlines()[-1], file=sys.stderr)
+	return times
+
+
+def main(modules, top: int):
+	for module in modules:
+		times = import_times(module)
+		if not times:
+			continue
+		total = max(cumulative for _, cumulative, _ in times)
+		print(f"import {module}: {total/1000:.1f} ms")
+
+		print(f"  slowest {top} imports (cumulative):")
+		for own, cumulative, name in sorted(times, key = lambda t: -t[1])[:top]:
+			print(f"    {cumulative/1000:>9.1f} ms {own/1000:>9.1f} ms self  {name.strip()}")
+
+		own_modules = [t for t in times if t[2].strip() in APP_MODULES]
+		if own_modules:
+			print("  app modules:")
+			for own, cumulative, name in own_modules:
+				print(f"    {cumulative/1000:>9.1f} ms  {name.strip()}")
+		print()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = __doc__,
+		formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("modules", nargs = "*", default = ["app"])
+	parser.add_argument("--top", type = int, default = 15)
+	args = parser.parse_args()
+	main(args.modules, args.top)
@@ -0,0 +1,42 @@
+'''
+Compares serial and parallel parsing of the csv files in the data folder,
+for different numbers of monthly exports.
+
+	python benchmarks/bench_ingest.py [files ...]
+'''
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dataset
+from synthetic import write_bank_export
+
+
+ROWS_PER_FILE = 5000
+
+
+def timed(func, *args, **kwargs) -> float:
+	start = time.perf_counter()
+	func(*args, **kwargs)
+	return time.perf_counter() - start
+
+
+def main(file_counts):
+	print(f"rows per file: {ROWS_PER_FILE}, cpus: {os.cpu_count()}")
+	print(f"{'files':>6} {'serial (s)':>11} {'parallel (s)':>13} {'speedup':>9}")
+	for count in file_counts:
+		with tempfile.TemporaryDirectory() as data_dir:
+			paths = [os.path.join(data_dir, f"export_{i:04d}.csv") for i in range(count)]
+			for i, path in enumerate(paths):
+				write_bank_export(path, ROWS_PER_FILE, seed = i)
+			serial = timed(dataset.load_csv_files, paths, workers = 1)
+			parallel = timed(dataset.load_csv_files, paths)
+		print(f"{count:>6} {serial:>11.3f} {parallel:>13.3f} {serial/parallel:>8.1f}x")
+
+
+if __name__ == '__main__':
+	counts = [int(n) for n in sys.argv[1:]] or [4, 16, 64, 128]
+	main(counts)
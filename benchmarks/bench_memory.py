@@ -0,0 +1,35 @@
+'''
+Reports the memory used by the cleaned dataset before and after
+compacting it, on a large synthetic transaction history.
+
+	python benchmarks/bench_memory.py [rows]
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dataset
+from synthetic import generate_bank_export
+
+
+def megabytes(frame) -> float:
+	return frame.memory_usage(index=True, deep=True).sum() / 2**20
+
+
+def main(rows: int):
+	cleaned = dataset.cleanup_dataset(generate_bank_export(rows))
+	compact = dataset.compact_dataset(cleaned.copy())
+
+	print(f"rows: {rows}")
+	print(f"{'column':>24} {'cleaned (MB)':>13} {'compact (MB)':>13}")
+	before = cleaned.memory_usage(index=False, deep=True) / 2**20
+	after = compact.memory_usage(index=False, deep=True) / 2**20
+	for column in before.index:
+		compacted = f"{after[column]:>13.2f}" if column in after else f"{'dropped':>13}"
+		print(f"{column:>24} {before[column]:>13.2f} {compacted}")
+	print(f"{'total':>24} {megabytes(cleaned):>13.2f} {megabytes(compact):>13.2f}")
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
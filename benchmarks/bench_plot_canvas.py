@@ -0,0 +1,66 @@
+'''
+Measures the time taken by PlotWidget.show() when redrawing a balance plot,
+with a persistent canvas widget and with a new canvas widget on each call.
+Requires Kivy, KivyMD and the matplotlib garden backend, and opens a window.
+
+	python benchmarks/bench_plot_canvas.py [redraws]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from kivymd.app import MDApp
+from kivy.clock import Clock
+
+from graph import PlotWidget
+
+
+class CanvasBenchmark(MDApp):
+
+	def __init__(self, redraws: int, **kwargs):
+		super().__init__(**kwargs)
+		self.redraws = redraws
+		self.modes = [True, False]
+		self.results = dict()
+
+	def build(self):
+		self.plot = PlotWidget()
+		return self.plot
+
+	def on_start(self):
+		Clock.schedule_once(self.run_mode, 0.5)
+
+	def run_mode(self, *largs):
+		if not self.modes:
+			self.report()
+			self.stop()
+			return
+		persistent = self.modes.pop(0)
+		self.plot.persistent = persistent
+		rng = np.random.default_rng(0)
+		times = []
+		for _ in range(self.redraws):
+			self.plot.clear()
+			self.plot.ax.plot(np.arange(1,32), rng.normal(1000, 50, 31), lw=3)
+			start = time.perf_counter()
+			self.plot.show()
+			# force the deferred draw so that it is included in the timing
+			self.plot.plot_widget.draw()
+			times.append(time.perf_counter() - start)
+		self.results["persistent" if persistent else "recreated"] = times
+		Clock.schedule_once(self.run_mode, 0.5)
+
+	def report(self):
+		print(f"{'mode':>12} {'mean (ms)':>10} {'p95 (ms)':>10}")
+		for mode, times in self.results.items():
+			times = np.array(times) * 1000
+			print(f"{mode:>12} {times.mean():>10.2f} {np.percentile(times, 95):>10.2f}")
+
+
+if __name__ == '__main__':
+	redraws = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+	CanvasBenchmark(redraws).run()
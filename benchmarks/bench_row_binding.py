@@ -0,0 +1,38 @@
+'''
+Compares building the transaction list data with DataFrame.iterrows()
+against reading whole columns at once, for days of different sizes.
+
+	python benchmarks/bench_row_binding.py [rows ...]
+'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dataset
+from store import transaction_records
+from synthetic import generate_bank_export
+
+
+def records_iterrows(rows):
+	'''Original implementation, kept as the reference for the benchmark'''
+	return [ dict(
+			name   = data['Transaction Description'],
+			amount = data['amount'],
+		) for _, data in rows.iterrows() ]
+
+
+def main(sizes):
+	print(f"{'rows':>6} {'iterrows (ms)':>14} {'columnar (ms)':>14} {'speedup':>9}")
+	for size in sizes:
+		rows = dataset.cleanup_dataset(generate_bank_export(size))
+		number = max(10, 5000 // size)
+		old = min(timeit.repeat(lambda: records_iterrows(rows), number=number, repeat=5)) / number
+		new = min(timeit.repeat(lambda: transaction_records(rows), number=number, repeat=5)) / number
+		print(f"{size:>6} {old*1000:>14.3f} {new*1000:>14.3f} {old/new:>8.1f}x")
+
+
+if __name__ == '__main__':
+	sizes = [int(n) for n in sys.argv[1:]] or [1, 50, 500]
+	main(sizes)
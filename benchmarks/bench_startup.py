@@ -0,0 +1,56 @@
+'''
+Measures the cold start of the app: the time from process start until
+the first frame has been drawn, and the resident memory at that point.
+Each run is a fresh process. Requires Kivy, KivyMD and a display.
+
+	python benchmarks/bench_startup.py [runs]
+'''
+import os
+import sys
+import json
+import subprocess
+
+import numpy as np
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs inside the child process, from the repository folder
+CHILD = '''
+import time, json, resource
+start = time.perf_counter()
+from kivy.clock import Clock
+import app
+
+class StartupApp(app.MainApp):
+	def on_start(self):
+		Clock.schedule_once(self.report, 0)
+
+	def report(self, *largs):
+		rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		print(json.dumps(dict(first_frame = time.perf_counter() - start, max_rss_kb = rss)))
+		self.stop()
+
+StartupApp().run()
+'''
+
+
+def run_once() -> dict:
+	output = subprocess.run([sys.executable, "-c", CHILD], cwd = ROOT,
+		capture_output = True, text = True, check = True).stdout
+	# kivy logs to stdout too, the result is the last json line
+	lines = [line for line in output.splitlines() if line.startswith("{")]
+	return json.loads(lines[-1])
+
+
+def main(runs: int):
+	results = [run_once() for _ in range(runs)]
+	first_frame = np.array([r['first_frame'] for r in results])
+	rss = np.array([r['max_rss_kb'] for r in results]) / 1024
+	print(f"runs: {runs}")
+	print(f"first frame: {np.median(first_frame):.3f} s (median)")
+	print(f"max rss:     {np.median(rss):.1f} MB (median)")
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,255 @@
+'''
+Times the data and plotting hot paths of the app on synthetic bank exports
+of several sizes, without opening a window, and writes the results as JSON
+so that they can be compared between commits.
+
+	python benchmarks/bench_suite.py [--rows N ...] [--repeat N] [--output results.json]
+	python benchmarks/bench_suite.py --compare before.json after.json
+
+The agg_* benchmarks time the matplotlib calls the plots make, on a plain
+figure rendered by Agg rather than through PlotWidget, which needs a running
+app. The Kivy canvas benchmark needs Kivy, and is reported as skipped
+when it can't run.
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import datetime as dt
+
+# keep kivy from parsing the command line and from logging to the console
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dataset
+import database
+from store import TransactionStore, transaction_records
+from synthetic import write_bank_export
+
+
+# Number of monthly exports the rows are split across
+FILES = 4
+
+# Most recent day of the synthetic exports
+END = dt.date(2022, 8, 31)
+
+# Transactions each day in the synthetic exports
+PER_DAY = 3.0
+
+# Days looked up by the day filter benchmark
+DAY_SAMPLES = 200
+
+
+def measure(func, repeat: int, setup = None, calls: int = 1) -> dict:
+	'''
+	Runs `func` `repeat` times and returns the best and median time per call
+	in milliseconds. `setup` returns the arguments of each run and isn't timed.
+	When `func` loops over several calls, pass their number as `calls`.
+	'''
+	times = []
+	for _ in range(repeat):
+		args = setup() if setup is not None else ()
+		start = time.perf_counter()
+		func(*args)
+		times.append((time.perf_counter() - start) / calls)
+	return dict(
+		best_ms   = min(times) * 1e3,
+		median_ms = float(np.median(times)) * 1e3,
+		repeat    = repeat,
+		calls     = calls,
+	)
+
+
+def write_exports(data_dir: str, rows: int):
+	'''Splits `rows` transactions across consecutive monthly exports'''
+	per_file = rows // FILES
+	days_per_file = int(per_file / PER_DAY)
+	for i in range(FILES):
+		end = END - dt.timedelta(days = i * days_per_file)
+		path = os.path.join(data_dir, f"export_{i:02d}.csv")
+		write_bank_export(path, per_file, seed = i, end = end, per_day = PER_DAY)
+
+
+def bench_loading(data_dir: str, repeat: int) -> dict:
+	results = dict()
+	files = database.TransactionDatabase.csv_files(data_dir)
+	results['load_csv_files'] = measure(lambda: dataset.load_csv_files(files), repeat)
+
+	paths = iter(range(repeat))
+	new_database = lambda: (database.TransactionDatabase(
+		os.path.join(data_dir, f"bench_{next(paths)}.db")),)
+	results['database_import'] = measure(
+		lambda db: db.import_folder(data_dir), repeat, setup = new_database)
+	db = database.TransactionDatabase(os.path.join(data_dir, "bench_0.db"))
+	results['database_load'] = measure(db.load, repeat)
+
+	raw = pd.concat([pd.read_csv(p) for p in files])
+	results['cleanup_dataset'] = measure(
+		dataset.cleanup_dataset, repeat, setup = lambda: (raw.copy(),))
+	return results
+
+
+def bench_queries(data: pd.DataFrame, repeat: int) -> dict:
+	results = dict()
+	results['store_build'] = measure(lambda: TransactionStore(data), repeat)
+	store = TransactionStore(data)
+	results['each_day'] = measure(
+		store.set_data, repeat, setup = lambda: (store.data,))
+
+	months = sorted({(int(p.year), int(p.month))
+		for p in store.data['datetime'].dt.to_period('M').unique()})
+
+	def home_month_select():
+		# the month shown, the month before it and the summary figures
+		for year, month in months:
+			old_month, old_year = (12, year - 1) if month == 1 else (month - 1, year)
+			store.month(year, month, daily = True)
+			store.month(old_year, old_month, daily = True)
+			store.summary.get(year, month)
+	results['home_month_select'] = measure(
+		home_month_select, repeat, calls = len(months))
+
+	year = store.years()[-1]
+	def graph_month_select():
+		for month in range(1, 13):
+			store.month(year, month, daily = True)
+		store.year(year, daily = True)
+	results['graph_month_select'] = measure(graph_month_select, repeat, calls = 13)
+
+	days = store.day_keys[np.linspace(0, len(store.day_keys) - 1, DAY_SAMPLES).astype(int)]
+	def data_day_filter():
+		for day in days:
+			transaction_records(store.day(day))
+	results['data_day_filter'] = measure(data_day_filter, repeat, calls = len(days))
+	return results
+
+
+def bench_plots(store: TransactionStore, repeat: int) -> dict:
+	# PlotWidget is a KivyMD widget that needs a running app, so these time
+	# the matplotlib work it does, on a plain figure drawn by Agg as in its
+	# thread mode. Changes to graph.py itself don't show up here.
+	from matplotlib.figure import Figure
+	from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+	results = dict()
+	fig = Figure()
+	FigureCanvasAgg(fig)
+	ax = fig.add_subplot(1,1,1)
+	fig.tight_layout(pad=5)
+	x = store.each_day['datetime']
+	y = store.each_day['balance']
+
+	def render():
+		# as GraphScreen does when choosing a year
+		ax.clear()
+		ax.plot(x, y, c='cyan', marker='o', ms=8, mec='k', lw=3)
+		fig.canvas.draw()
+	results['agg_figure_render'] = measure(render, repeat)
+
+	# as HomeScreen does when choosing a month
+	ax.clear()
+	line, = ax.plot([], [], c = '#4285F4', lw=3)
+	year, month = int(store.data['year'].iloc[-1]), int(store.data['datetime'].iloc[-1].month)
+	days = store.month(year, month, daily = True)
+	def update():
+		line.set_data(days['day'], days['balance'])
+		ax.relim()
+		ax.autoscale_view()
+		fig.canvas.draw()
+	results['agg_line_update'] = measure(update, repeat)
+
+	# the same update drawn with kivy instructions, without rasterizing
+	try:
+		from canvasplot import CanvasPlot
+		canvas_plot = CanvasPlot(size = fig.canvas.get_width_height())
+		canvas_plot.add_line('current', c = '#4285F4', lw=3)
+		def canvas_update():
+			canvas_plot.set_line_data('current', days['day'], days['balance'])
+			canvas_plot.show()
+		results['canvas_plot_update'] = measure(canvas_update, repeat)
+	except Exception as error:
+		results['canvas_plot_update'] = f"skipped: {error!r}"
+	return results
+
+
+def run(rows: int, repeat: int) -> dict:
+	with tempfile.TemporaryDirectory() as data_dir:
+		write_exports(data_dir, rows)
+		results = bench_loading(data_dir, repeat)
+		data = database.TransactionDatabase(os.path.join(data_dir, "bench_0.db")).load()
+	results.update(bench_queries(data, repeat))
+	results.update(bench_plots(TransactionStore(data), repeat))
+	return results
+
+
+def git_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+			cwd = os.path.dirname(os.path.abspath(__file__)),
+			capture_output = True, text = True, check = True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def compare(before_path: str, after_path: str):
+	'''Prints the ratio of the best times of two result files'''
+	with open(before_path) as f: before = json.load(f)
+	with open(after_path) as f: after = json.load(f)
+	print(f"before: {before['meta']['commit']}, after: {after['meta']['commit']}")
+	print(f"{'rows':>8} {'benchmark':>20} {'before (ms)':>12} {'after (ms)':>12} {'ratio':>7}")
+	for rows, results in after['results'].items():
+		for name, result in results.items():
+			old = before['results'].get(rows, {}).get(name)
+			if not isinstance(result, dict) or not isinstance(old, dict):
+				continue
+			ratio = result['best_ms'] / old['best_ms']
+			print(f"{rows:>8} {name:>20} {old['best_ms']:>12.3f} "
+				f"{result['best_ms']:>12.3f} {ratio:>6.2f}x")
+
+
+def main():
+	parser = argparse.ArgumentParser(description = __doc__,
+		formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type = int, nargs = "+", default = [1000, 10000, 100000],
+		help = "number of synthetic transactions of each run")
+	parser.add_argument("--repeat", type = int, default = 5)
+	parser.add_argument("--output", help = "JSON file to write, printed if not given")
+	parser.add_argument("--compare", nargs = 2, metavar = ("BEFORE", "AFTER"),
+		help = "compare two result files instead of running the benchmarks")
+	args = parser.parse_args()
+
+	if args.compare:
+		compare(*args.compare)
+		return
+
+	report = dict(
+		meta = dict(
+			commit   = git_commit(),
+			date     = dt.datetime.now().isoformat(timespec = 'seconds'),
+			python   = platform.python_version(),
+			platform = platform.platform(),
+			numpy    = np.__version__,
+			pandas   = pd.__version__,
+			repeat   = args.repeat,
+		),
+		results = {str(rows) : run(rows, args.repeat) for rows in args.rows},
+	)
+	text = json.dumps(report, indent = 2)
+	if args.output:
+		with open(args.output, "w") as f:
+			f.write(text + "\n")
+	else:
+		print(text)
+
+
+if __name__ == '__main__':
+	main()
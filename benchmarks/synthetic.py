@@ -0,0 +1,54 @@
+'''
+Generates synthetic bank exports with the same columns as the csv files
+downloaded from the online banking portal.
+'''
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+
+DESCRIPTIONS = [
+	"COSTA COFFEE", "TESCO STORES", "SAINSBURYS", "AMAZON", "TFL TRAVEL",
+	"NETFLIX", "SALARY", "RENT", "BOOTS", "PRET A MANGER", "SHELL", "UBER",
+]
+
+
+def generate_bank_export(rows: int, seed: int = 0,
+	end: dt.date = dt.date(2022, 8, 31), per_day: float = 3.0) -> pd.DataFrame:
+	'''
+	Returns a dataframe of `rows` transactions ending on `end`,
+	ordered from newest to oldest like the bank's own exports.
+	On average there are `per_day` transactions each day.
+	'''
+	rng = np.random.default_rng(seed)
+
+	days_back = np.sort(rng.integers(0, max(1, int(rows / per_day)), rows))
+	dates = pd.to_datetime(end) - pd.to_timedelta(days_back, unit='D')
+
+	is_income = rng.random(rows) < 0.05
+	value = np.round(rng.gamma(2.0, 15.0, rows), 2)
+	value[is_income] = np.round(rng.normal(1500, 200, is_income.sum()), 2)
+
+	debit  = np.where(is_income, np.nan, value)
+	credit = np.where(is_income, value, np.nan)
+
+	# newest row holds the current balance, older ones are walked backwards
+	amount = np.where(is_income, credit, -debit)
+	balance = 5000.0 - np.concatenate([[0.0], np.cumsum(amount)[:-1]])
+
+	return pd.DataFrame({
+		'Transaction Date'        : dates.strftime("%d/%m/%Y"),
+		'Transaction Type'        : np.where(is_income, "FPI", "DEB"),
+		'Sort Code'               : "'11-22-33",
+		'Account Number'          : 12345678,
+		'Transaction Description' : rng.choice(DESCRIPTIONS, rows),
+		'Debit Amount'            : debit,
+		'Credit Amount'           : credit,
+		'Balance'                 : np.round(balance, 2),
+	})
+
+
+def write_bank_export(path: str, rows: int, seed: int = 0, **kwargs):
+	'''Writes a synthetic bank export to a csv file'''
+	generate_bank_export(rows, seed = seed, **kwargs).to_csv(path, index=False)
@@ -0,0 +1,270 @@
+from kivy.uix.stencilview import StencilView
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, InstructionGroup, Line, Rectangle
+from kivy.metrics import dp, sp
+from kivy.utils import colormap, get_color_from_hex
+from kivy.properties import ListProperty, OptionProperty
+
+from typing import Tuple
+
+import numpy as np
+
+
+# Single letter colours understood by matplotlib
+COLOR_LETTERS = {
+	'k': 'black', 'w': 'white', 'b': 'blue', 'r': 'red',
+	'g': 'green', 'c': 'cyan', 'm': 'magenta', 'y': 'yellow',
+}
+
+# Text colour of each theme, for labels without a colour of their own
+THEME_TEXT_COLORS = {'light': 'black', 'dark': 'white'}
+
+
+def to_rgba(color, alpha: float = None) -> list:
+	'''
+	Converts a colour given as for matplotlib, as a name,
+	a single letter, a hex string or an RGB(A) sequence, into RGBA.
+	'''
+	if isinstance(color, str):
+		color = COLOR_LETTERS.get(color, color)
+		rgba = get_color_from_hex(color) if color.startswith('#') else colormap[color.lower()]
+	else:
+		rgba = list(color)
+	rgba = list(rgba) + [1.0] * (4 - len(rgba))
+	if alpha is not None:
+		rgba[3] = alpha
+	return rgba
+
+
+def to_numbers(values) -> np.ndarray:
+	'''Returns values as floats, with dates as days since the epoch'''
+	values = np.asarray(values)
+	if np.issubdtype(values.dtype, np.datetime64):
+		return values.astype('datetime64[s]').astype(np.float64) / 86400
+	return values.astype(np.float64)
+
+
+class CanvasLine():
+	'''
+	Line through data points, drawn with a single Line instruction.
+	Takes the colour, width, style and alpha arguments of plt.plot(),
+	other arguments such as markers are ignored.
+	'''
+
+	def __init__(self, c = None, color = 'k', lw: float = None, linewidth: float = 1.5,
+			alpha: float = None, ls: str = '-', **kwargs):
+		color = c or color
+		lw = lw or linewidth
+		self.x = self.y = np.empty(0)
+		self.group = InstructionGroup()
+		self.group.add(Color(*to_rgba(color, alpha)))
+		if ls in (':', '--', 'dotted', 'dashed'):
+			# dashes are only drawn on lines 1 pixel wide
+			self.line = Line(width = 1, dash_length = dp(2), dash_offset = dp(3))
+		else:
+			# half the thickness in points, as for matplotlib
+			self.line = Line(width = max(dp(lw) / 2, 1))
+		self.group.add(self.line)
+
+	def set_data(self, x, y):
+		self.x, self.y = to_numbers(x), to_numbers(y)
+
+	def update(self, plot):
+		if len(self.x) < 2:
+			self.line.points = []
+			return
+		px, py = plot.to_pixels(self.x, self.y)
+		self.line.points = np.column_stack([px, py]).ravel().tolist()
+
+
+class CanvasGuide(CanvasLine):
+	'''Horizontal line across the whole width of the plot'''
+
+	def set_y(self, y: float):
+		self.y = np.array([y, y], dtype = np.float64)
+
+	def update(self, plot):
+		if len(self.y) == 0:
+			self.line.points = []
+			return
+		_, py = plot.to_pixels(np.zeros(1), self.y[:1])
+		self.line.points = [plot.x, py[0], plot.right, py[0]]
+
+
+class CanvasText():
+	'''Text placed on a data point, drawn as a texture'''
+
+	def __init__(self, c = None, color = None, alpha: float = None,
+			fontsize: float = 10, **kwargs):
+		self.color = c or color
+		self.alpha = alpha
+		self.fontsize = fontsize
+		self.x = self.y = 0.0
+		self.text = ""
+		# text of the current texture, which is only rendered again when it changes
+		self.rendered = None
+		self.group = InstructionGroup()
+		self.color_instruction = Color()
+		self.rect = Rectangle()
+		self.group.add(self.color_instruction)
+		self.group.add(self.rect)
+
+	def set(self, x: float, y: float, text: str):
+		self.x, self.y, self.text = float(x), float(y), text
+
+	def update(self, plot):
+		color = self.color or THEME_TEXT_COLORS[plot.theme]
+		self.color_instruction.rgba = to_rgba(color, self.alpha)
+		if self.rendered != self.text:
+			label = CoreLabel(text = self.text, font_size = sp(self.fontsize))
+			label.refresh()
+			self.rect.texture = label.texture
+			self.rect.size = label.texture.size
+			self.rendered = self.text
+		px, py = plot.to_pixels(np.array([self.x]), np.array([self.y]))
+		# text sits above the point, starting at it, as for Axes.text()
+		self.rect.pos = (px[0], py[0])
+
+
+class CanvasPlot(StencilView):
+	'''
+	Draws line charts with kivy graphics instructions instead of matplotlib,
+	so drawing is done by the GPU and matplotlib doesn't need to be imported.
+	It has the drawing methods of graph.PlotWidget that don't need
+	matplotlib's Axes, so that screens can use either of them:
+
+		plot = CanvasPlot()
+		plot.add_line('balance', c='#4285F4', lw=3)
+		plot.set_line_data('balance', days, balances)
+		plot.add_guide('zero', ls=':', c='k', alpha=0.3)
+		plot.set_guide('zero', 0)
+		plot.show()
+
+	Changes are drawn on the next frame. As matplotlib clips to the axes,
+	nothing is drawn outside the widget.
+	'''
+
+	xlim = ListProperty([0.0, 1.0])
+	'''Data values at the left and right edges of the widget'''
+
+	ylim = ListProperty([0.0, 1.0])
+	'''Data values at the bottom and top edges of the widget'''
+
+	theme = OptionProperty("light", options = ["dark", "light"])
+	'''Colour scheme of the text, see set_theme()'''
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.artists = dict()
+		self.redraw_trigger = Clock.create_trigger(self.redraw)
+		for name in ('pos', 'size', 'xlim', 'ylim', 'theme'):
+			self.fbind(name, self.redraw_trigger)
+
+	def to_pixels(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+		'''Converts data values into window coordinates'''
+		(x0, x1), (y0, y1) = self.xlim, self.ylim
+		px = self.x + (x - x0) / ((x1 - x0) or 1.0) * self.width
+		py = self.y + (y - y0) / ((y1 - y0) or 1.0) * self.height
+		return px, py
+
+	def redraw(self, *largs):
+		for artist in self.artists.values():
+			artist.update(self)
+
+	def add_artist(self, name: str, artist):
+		'''Registers an artist under a name and adds it to the canvas'''
+		if name in self.artists:
+			self.canvas.remove(self.artists[name].group)
+		self.artists[name] = artist
+		self.canvas.add(artist.group)
+		self.redraw_trigger()
+		return artist
+
+	def get_artist(self, name: str):
+		'''Returns a registered artist, or None if there isn't one'''
+		return self.artists.get(name)
+
+	def plot(self, x, y, **kwargs):
+		'''
+		Draws a line through the data points, fitting the limits to it.
+		Accepts the colour, line width, line style and alpha arguments of plt.plot().
+		'''
+		line = self.add_line(f"line_{len(self.artists)}", **kwargs)
+		line.set_data(x, y)
+		self.autoscale()
+		return [line]
+
+	def add_line(self, name: str, **kwargs):
+		'''Creates an empty line and registers it under a name'''
+		return self.add_artist(name, CanvasLine(**kwargs))
+
+	def set_line_data(self, name: str, x, y, autoscale: bool = True):
+		'''
+		Replaces the values of a registered line.
+		If autoscale is True, the limits are fitted to the new values.
+		'''
+		self.artists[name].set_data(x, y)
+		if autoscale:
+			self.autoscale()
+		self.redraw_trigger()
+
+	def autoscale(self):
+		'''Fits the limits to the data of every line, with a margin'''
+		lines = [a for a in self.artists.values()
+			if type(a) is CanvasLine and len(a.x) > 0]
+		if not lines:
+			return
+		x = np.concatenate([line.x for line in lines])
+		y = np.concatenate([line.y for line in lines])
+		margin = 0.05 * ((y.max() - y.min()) or 1.0)
+		self.xlim = [x.min(), x.max()]
+		self.ylim = [y.min() - margin, y.max() + margin]
+
+	def add_guide(self, name: str, **kwargs):
+		'''Creates a horizontal line across the plot and registers it under a name'''
+		return self.add_artist(name, CanvasGuide(**kwargs))
+
+	def set_guide(self, name: str, y: float):
+		self.artists[name].set_y(y)
+		self.redraw_trigger()
+
+	def add_label(self, name: str, **kwargs):
+		'''Creates an empty text label and registers it under a name'''
+		return self.add_artist(name, CanvasText(**kwargs))
+
+	def set_label(self, name: str, x: float, y: float, text: str):
+		'''Moves a registered label to a data point and changes its text'''
+		self.artists[name].set(x, y, text)
+		self.redraw_trigger()
+
+	def set_xlim(self, lo: float, hi: float):
+		self.xlim = [lo, hi]
+
+	def set_ylim(self, lo: float, hi: float):
+		self.ylim = [lo, hi]
+
+	def hide_axes(self):
+		'''No axes are drawn, kept for compatibility with PlotWidget'''
+		pass
+
+	def show(self, selection = None, version = None):
+		'''Draws the changes straight away instead of on the next frame'''
+		self.redraw_trigger.cancel()
+		self.redraw()
+
+	def show_cached(self, selection, version) -> bool:
+		'''Drawing is cheap enough that nothing is cached, see PlotWidget.show_cached()'''
+		return False
+
+	def clear(self):
+		'''Removes everything drawn'''
+		for artist in self.artists.values():
+			self.canvas.remove(artist.group)
+		self.artists.clear()
+
+	def set_theme(self, theme: str):
+		'''Quick theming - 'dark' or 'light' '''
+		if theme not in THEME_TEXT_COLORS:
+			raise ValueError("theme can only be 'dark' or 'light'")
+		self.theme = theme
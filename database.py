@@ -0,0 +1,293 @@
+import os
+import glob
+import hashlib
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import dataset
+
+
+DATABASE_PATH = os.path.join(dataset.DATA_DIR, "transactions.db")
+
+# Database column names of the cleaned dataset columns
+COLUMNS = {
+	'Transaction Type'        : 'type',
+	'Sort Code'               : 'sort_code',
+	'Account Number'          : 'account',
+	'Transaction Description' : 'description',
+	'expense'                 : 'expense',
+	'income'                  : 'income',
+	'balance'                 : 'balance',
+	'amount'                  : 'amount',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+	id          INTEGER PRIMARY KEY,
+	key         TEXT NOT NULL UNIQUE,
+	date        TEXT NOT NULL,
+	year_month  TEXT NOT NULL,
+	seq         REAL NOT NULL,
+	type        TEXT,
+	sort_code   TEXT,
+	account     TEXT,
+	description TEXT,
+	expense     REAL,
+	income      REAL,
+	balance     REAL,
+	amount      REAL
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_year_month ON transactions (year_month);
+CREATE TABLE IF NOT EXISTS files (
+	path  TEXT PRIMARY KEY,
+	size  INTEGER NOT NULL,
+	mtime INTEGER NOT NULL
+);
+'''
+
+
+class TransactionDatabase():
+	'''
+	SQLite database holding every transaction imported from the bank exports.
+
+	Each transaction gets a key hashed from its date, type, description,
+	amounts and balance, so that importing exports whose dates overlap
+	only inserts the transactions that are not stored yet.
+	Dates are indexed by day and by month. The app loads every transaction
+	into a store.TransactionStore, which answers the queries by date.
+
+	Parameters
+	----------
+		path:		(str) Database file, created if it doesn't exist
+	'''
+
+	def __init__(self, path: str = DATABASE_PATH):
+		self.path = path
+		with self.connect() as connection:
+			connection.executescript(SCHEMA)
+
+	@contextmanager
+	def connect(self) -> sqlite3.Connection:
+		'''Opens a new connection, committed and closed when leaving the block'''
+		# a new connection each time, so that any thread may use the database
+		connection = sqlite3.connect(self.path)
+		try:
+			with connection:
+				yield connection
+		finally:
+			connection.close()
+
+	@staticmethod
+	def transaction_keys(data: pd.DataFrame, iso_dates: pd.Series) -> List[str]:
+		'''
+		Returns the deduplication key of each transaction.
+		Identical transactions on the same day are told apart
+		by the number of times they appeared before in the export.
+		'''
+		fields = pd.DataFrame({
+			'date'        : iso_dates,
+			'type'        : data.get('Transaction Type', ""),
+			'description' : data.get('Transaction Description', ""),
+			'expense'     : data['expense'].round(2),
+			'income'      : data['income'].round(2),
+			'balance'     : data['balance'].round(2),
+		})
+		# blank cells are read as NaN, which newer pandas keeps as a float
+		# instead of turning it into "nan" as older versions did
+		fields = fields.astype(object).where(fields.notna(), "nan").astype(str)
+		fields['occurrence'] = fields.groupby(list(fields.columns)).cumcount().astype(str)
+		rows = fields.apply("|".join, axis=1)
+		return [hashlib.sha1(row.encode()).hexdigest() for row in rows]
+
+	@staticmethod
+	def day_positions(connection: sqlite3.Connection, table: pd.DataFrame) -> np.ndarray:
+		'''
+		Returns the position of each transaction within its day, newest first,
+		among the transactions of that day already in the database.
+
+		Exports overlap, so the transactions of a day may come from several
+		files. The stored transactions that an export also lists tell where
+		its new ones go. When it shares none of them, the new transactions
+		go before the stored ones if their balances carry on from them,
+		and after them otherwise.
+		'''
+		positions = table.groupby('date', sort=False).cumcount().to_numpy(dtype=np.float64)
+		dates = table['date'].to_numpy()
+		stored = pd.read_sql_query(
+			"SELECT key, date, seq, balance FROM transactions WHERE date >= ? AND date <= ?",
+			connection, params = (dates.min(), dates.max()))
+		keys = table['key'].to_numpy()
+		balances = table['balance'].to_numpy(dtype=np.float64)
+		amounts = table['amount'].to_numpy(dtype=np.float64)
+
+		for date, day in stored.groupby('date'):
+			rows = np.flatnonzero(dates == date)
+			if len(rows) == 0:
+				continue
+			day = day.sort_values('seq')
+			known = dict(zip(day['key'], day['seq']))
+			seq = np.array([known.get(key, np.nan) for key in keys[rows]])
+			shared = np.flatnonzero(~np.isnan(seq))
+			order = np.arange(len(rows))
+
+			if len(shared) == 0:
+				# balance before the oldest new transaction
+				previous = balances[rows[-1]] - amounts[rows[-1]]
+				if abs(previous - day['balance'].iloc[0]) < 0.005:
+					seq = day['seq'].iloc[0] - len(rows) + order
+				else:
+					seq = day['seq'].iloc[-1] + 1 + order
+			else:
+				first, last = shared[0], shared[-1]
+				between = np.isnan(seq) & (order > first) & (order < last)
+				seq[between] = np.interp(order[between], shared, seq[shared])
+				seq[:first] = seq[first] - (first - order[:first])
+				seq[last + 1:] = seq[last] + (order[last + 1:] - last)
+			positions[rows] = seq
+		return positions
+
+	def import_dataframe(self, data: pd.DataFrame) -> int:
+		'''
+		Inserts cleaned transactions that are not in the database yet.
+		Returns the number of inserted transactions.
+		'''
+		return self.insert(data)[1]
+
+	def insert(self, data: pd.DataFrame):
+		'''
+		Inserts cleaned transactions that are not in the database yet.
+		Returns the id of the last row before inserting, so that new rows
+		have larger ids, and the number of inserted transactions.
+		'''
+		if data.shape[0] == 0:
+			return None, 0
+		iso_dates = data['datetime'].dt.strftime("%Y-%m-%d")
+		table = pd.DataFrame({
+			'key'        : TransactionDatabase.transaction_keys(data, iso_dates),
+			'date'       : iso_dates,
+			'year_month' : iso_dates.str[:7],
+		})
+		for column, name in COLUMNS.items():
+			table[name] = data[column].to_numpy() if column in data else None
+		table = table.reset_index(drop=True)
+
+		with self.connect() as connection:
+			table['seq'] = TransactionDatabase.day_positions(connection, table)
+			# sqlite only accepts python objects, with None for missing values
+			table = table.astype(object).where(table.notna(), None)
+			names = list(table.columns)
+			sql = f"INSERT OR IGNORE INTO transactions ({', '.join(names)}) " \
+				f"VALUES ({', '.join('?' * len(names))})"
+			last_id = connection.execute("SELECT IFNULL(MAX(id), 0) FROM transactions").fetchone()[0]
+			before = connection.total_changes
+			connection.executemany(sql, table.itertuples(index=False, name=None))
+			return last_id, connection.total_changes - before
+
+	def import_csv(self, path: str) -> int:
+		'''Imports a bank export, returning the number of new transactions'''
+		# taken before reading, so that rows written meanwhile are read next time
+		stat = TransactionDatabase.file_stat(path)
+		inserted = self.import_dataframe(dataset.load_csv(path))
+		self.mark_imported(path, stat)
+		return inserted
+
+	@staticmethod
+	def file_stat(path: str) -> Tuple[int, int]:
+		'''Returns the size and modification time of a file, which tell if it changed'''
+		stat = os.stat(path)
+		return stat.st_size, stat.st_mtime_ns
+
+	def mark_imported(self, path: str, stat: Tuple[int, int]):
+		'''Records the size and modification time of a file as it was read'''
+		with self.connect() as connection:
+			connection.execute(
+				"INSERT OR REPLACE INTO files (path, size, mtime) VALUES (?, ?, ?)",
+				(path, *stat))
+
+	def changed_files(self, paths: List[str]) -> List[str]:
+		'''Returns the files that are new or modified since they were imported'''
+		with self.connect() as connection:
+			known = {path : (size, mtime) for path, size, mtime
+				in connection.execute("SELECT path, size, mtime FROM files")}
+		return [path for path in paths
+			if known.get(path) != TransactionDatabase.file_stat(path)]
+
+	def import_files(self, paths: List[str], workers: int = None) -> pd.DataFrame:
+		'''
+		Imports several csv files and returns every transaction of the days
+		that gained new ones, since new transactions may go between stored
+		ones of the same day.
+		'''
+		# taken before reading, so that rows written meanwhile are read next time
+		stats = [TransactionDatabase.file_stat(path) for path in paths]
+		last_ids = []
+		for path, stat, data in zip(paths, stats, dataset.load_csv_files(paths, workers)):
+			last_id, inserted = self.insert(data)
+			if inserted > 0:
+				last_ids.append(last_id)
+			self.mark_imported(path, stat)
+		if not last_ids:
+			return self.query("0")
+		return self.query("date IN (SELECT date FROM transactions WHERE id > ?)", (min(last_ids),))
+
+	def import_folder(self, data_dir: str = dataset.DATA_DIR, workers: int = None) -> int:
+		'''
+		Imports the csv files of a folder that are new or have changed
+		since the last import. Returns the number of new transactions.
+		'''
+		before = self.count()
+		self.import_files(self.changed_files(self.csv_files(data_dir)), workers)
+		return self.count() - before
+
+	def count(self) -> int:
+		'''Returns the number of stored transactions'''
+		with self.connect() as connection:
+			return connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+	@staticmethod
+	def csv_files(data_dir: str = dataset.DATA_DIR) -> List[str]:
+		return sorted(glob.glob(os.path.join(data_dir, "*.csv")))
+
+	def query(self, where: str = "", params: tuple = ()) -> pd.DataFrame:
+		'''
+		Returns the transactions matching an SQL condition
+		in the same form as `dataset.cleanup_dataset`, newest first.
+		'''
+		names = ['date'] + list(COLUMNS.values())
+		sql = f"SELECT {', '.join(names)} FROM transactions"
+		if where:
+			sql += f" WHERE {where}"
+		sql += " ORDER BY date DESC, seq ASC"
+		with self.connect() as connection:
+			table = pd.read_sql_query(sql, connection, params = params)
+
+		data = table.rename({name : column for column, name in COLUMNS.items()}, axis='columns')
+		data = data.drop(columns=['date'])
+		data['datetime'] = pd.to_datetime(table['date'], format="%Y-%m-%d")
+		return dataset.compact_dataset(dataset.derive_date_columns(data))
+
+	def load(self) -> pd.DataFrame:
+		'''Returns every transaction'''
+		return self.query()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description = "Import bank exports into the transaction database")
+	parser.add_argument("files", nargs = "*",
+		help = "csv files to import, by default the new ones in the data folder")
+	parser.add_argument("--database", default = DATABASE_PATH)
+	args = parser.parse_args()
+
+	database = TransactionDatabase(args.database)
+	if args.files:
+		inserted = sum(database.import_csv(path) for path in args.files)
+	else:
+		inserted = database.import_folder()
+	print(f"Imported {inserted} new transactions")
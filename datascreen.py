@@ -1,37 +1,22 @@
-
 from kivymd.uix.screen import MDScreen
-from kivymd.app import MDApp
-from kivy.uix.screenmanager import ScreenManager
-from kivy.lang import Builder
 
-from kivymd.uix.toolbar import MDTopAppBar
-from kivymd.uix.pickers import MDDatePicker
-from kivymd.uix.datatables import MDDataTable
 from kivymd.uix.card import MDCard
 from kivymd.uix.label import MDLabel, MDIcon
 from kivymd.uix.behaviors import RoundedRectangularElevationBehavior
-from kivymd.uix.scrollview import MDScrollView
-from kivy.metrics import dp, sp
-
-from kivy.core.window import Window
-#Window.size = (1000, 600)
+from kivymd.uix.menu import MDDropdownMenu
+from kivy.metrics import dp
 
-from graphscreen import GraphScreen
-import glob
-import pandas as pd
+from store import transaction_records
+from profiling import timed, interaction
+from scheduler import scheduler
 import datetime as dt
-import calendar
-import numpy as np
+from functools import partial
 
 from kivy.properties import (
 	NumericProperty,
 	OptionProperty,
 	ObjectProperty,
 	StringProperty,
-	ListProperty,
-	BooleanProperty,
-	VariableListProperty,
-	ReferenceListProperty
 )
 
 class MD3Card(MDCard, RoundedRectangularElevationBehavior):
@@ -40,12 +25,35 @@ class MD3Card(MDCard, RoundedRectangularElevationBehavior):
 
 
 class TransactionCard(MD3Card):
+	'''
+	Card that shows a single transaction.
+	Used as the view class of the transaction list, so the same card
+	is reused for different rows by changing its properties.
+	'''
+
+	icon = StringProperty("help-circle-outline")
+
+	name = StringProperty("Transaction")
+
+	amount = NumericProperty(0.0)
 
 	def __init__(self, *args, **kwargs):
-		self.icon = kwargs.pop("icon", "help-circle-outline")
-		self.name = kwargs.pop("name", "Transaction")
-		self.amount = kwargs.pop("amount", 0.0)
+		kwargs.setdefault("padding", 16)
+		kwargs.setdefault("elevation", 5)
 		super().__init__(*args, **kwargs)
+		self.load()
+
+	def on_icon(self, instance, value):
+		if hasattr(self, "icon_obj"):
+			self.icon_obj.icon = value
+
+	def on_name(self, instance, value):
+		if hasattr(self, "vendor_label"):
+			self.vendor_label.text = value
+
+	def on_amount(self, instance, value):
+		if hasattr(self, "amount_label"):
+			self.amount_label.text = f"£{value:,.2f}"
 
 	def load(self):
 		"""
@@ -90,77 +98,203 @@ class DataScreen(MDScreen):
 	dataset = ObjectProperty(None)
 	'''Pandas dataframe that holds financial data'''
 
+	store = ObjectProperty(None, allownone = True)
+	'''Financial data indexed by date, None while the dataset is loading'''
+
 	transaction_list = ObjectProperty(None)
-	'''Scrollable transaction list widget'''
+	'''Recycled transaction list widget, rows are set through its data'''
 
 	date_label = ObjectProperty(None)
 	'''Label widget that displays chosen date'''
 
 	day_spent_label = ObjectProperty(None)
-	'''Label widget for the amount of money spent in a day'''
+	'''Label widget for the amount of money spent in the chosen period'''
+
+	mode = OptionProperty("day", options = ["day", "week", "month", "range"])
+	'''Period of time whose transactions are listed'''
+
+	page_size = NumericProperty(100)
+	'''Number of transactions added to the list each time it is scrolled down'''
 
 	def __init__(self, *args, **kwargs):
 		super().__init__(*args, **kwargs)
 		self.chosen_date = dt.datetime.now()
+		self.range_start = self.range_stop = None
+		self.rows = None
+		self.loaded = 0
+		self.mode_menu = None
+		# binding that restores the scroll position once a new page is laid out
+		self.page_binding = None
+
+	def on_dataset_ready(self, app):
+		if self.manager is not None and self.manager.current == self.name:
+			self.load_transactions()
 
 	def on_date_choice(self, instance, value, date_range):
+		if len(date_range) > 1:
+			self.mode = "range"
+			self.range_start = min(date_range)
+			self.range_stop = max(date_range) + dt.timedelta(days=1)
+			value = self.range_start
+		elif self.mode == "range":
+			self.mode = "day"
 		self.chosen_date = value
 		self.load_transactions()
 
-	def show_date_picker(self):
+	def show_date_picker(self, mode: str = None):
+		'''Picks a day, or a range of days if `mode` (the current one by default) is "range"'''
+		from kivymd.uix.pickers import MDDatePicker
+		mode = mode or self.mode
 		date_picker = MDDatePicker(
 			year  = self.chosen_date.year,
 			month = self.chosen_date.month,
-			day   = self.chosen_date.day
+			day   = self.chosen_date.day,
+			mode  = "range" if mode == "range" else "picker"
 		)
 		date_picker.bind(on_save = self.on_date_choice)
 		date_picker.open()
 
+	def show_mode_menu(self, caller):
+		if self.mode_menu is None:
+			modes = ["day", "week", "month", "range"]
+			self.mode_menu = MDDropdownMenu(
+				caller = caller,
+				items = [ dict(
+					text = m.capitalize(),
+					viewclass = "OneLineListItem",
+					on_release = partial(self.on_mode_select, m)
+				) for m in modes ],
+				width_mult = 2,
+			)
+		self.mode_menu.open()
+
+	def on_mode_select(self, mode):
+		self.mode_menu.dismiss()
+		if mode == "range":
+			# the mode changes once a range is saved, cancelling keeps the current one
+			self.show_date_picker(mode)
+			return
+		self.mode = mode
+		self.load_transactions()
+
+	def period_bounds(self):
+		'''Returns the first day and the day after the last of the chosen period'''
+		day = dt.date(self.chosen_date.year, self.chosen_date.month, self.chosen_date.day)
+		if self.mode == "range" and self.range_start is not None:
+			return self.range_start, self.range_stop
+		if self.mode == "week":
+			start = day - dt.timedelta(days = day.weekday())
+			return start, start + dt.timedelta(days=7)
+		if self.mode == "month":
+			start = day.replace(day=1)
+			return start, (start + dt.timedelta(days=32)).replace(day=1)
+		return day, day + dt.timedelta(days=1)
+
+	def shift_period(self, direction: int):
+		'''Moves to the next (1) or previous (-1) period of the same length'''
+		start, stop = self.period_bounds()
+		if self.mode == "month":
+			if direction > 0:
+				self.chosen_date = stop
+			else:
+				self.chosen_date = (start - dt.timedelta(days=1)).replace(day=1)
+		else:
+			length = (stop - start) * direction
+			if self.mode == "range" and self.range_start is not None:
+				self.range_start += length
+				self.range_stop += length
+			self.chosen_date = start + length
+		self.load_transactions()
+
+	def period_title(self, start, stop) -> str:
+		if self.mode == "day":
+			return self.chosen_date.strftime("%A, %d %b %Y")
+		if self.mode == "month":
+			return start.strftime("%B %Y")
+		last = stop - dt.timedelta(days=1)
+		return f"{start.strftime('%d %b')} - {last.strftime('%d %b %Y')}"
+
+	@staticmethod
+	def row_data(rows) -> list:
+		'''Converts transactions into the data of the transaction list'''
+		return transaction_records(rows)
+
 	def load_transactions(self):
-		# Calculate day transactions
+		'''Lists the transactions of the chosen period on the next frame, if not already'''
+		interaction("data.load_transactions")
+		version = self.store.version if self.store is not None else None
+		scheduler.request(self, self.show_transactions,
+			(self.mode, self.period_bounds(), version))
+
+	def show_transactions(self):
+		start, stop = self.period_bounds()
+		if self.store is None:
+			self.date_label.title = "Loading..."
+			self.transaction_list.data = []
+			return
 
-		# inefficient, refactor
-		idx = self.dataset['date'] == self.chosen_date.strftime("%d/%m/%Y")
-		dates = self.dataset[idx]
-		tr_num = idx.sum()
+		# Transactions of the period, as a slice of the date-sorted store
+		with timed("data.filter"):
+			self.rows = self.store.between(start, stop)
+		tr_num = self.rows.shape[0]
 
 		# Update labels
-		self.date_label.title = self.chosen_date.strftime("%A, %d %b %Y")
-		day_amount = np.abs( dates['expense'].sum() )
+		self.date_label.title = self.period_title(start, stop)
+		day_amount = abs( self.rows['expense'].sum() )
 		self.day_spent_label.text = f"£{day_amount:,.2f}"
 
-		# print(self.date_label.ids.label_title.font_size)
+		# Update transaction cards, only the visible ones are instantiated
+		self.cancel_page()
+		self.transaction_list.scroll_y = 1
+		if(tr_num == 0):
+			self.loaded = 0
+			self.transaction_list.data = [dict(name = "No transactions", amount = 0.0)]
+			return
 
-		# Update transaction cards
-		self.transaction_list.clear_widgets()
-		card_kw = dict(
-			padding = 16,
-			size_hint = (None, None),
-			size_hint_y = "50dp",
-			size_hint_x = self.transaction_list.width,
-			elevation = 5
-		)
+		self.loaded = min(tr_num, int(self.page_size))
+		with timed("data.rows"):
+			rows = DataScreen.row_data(self.rows.iloc[:self.loaded])
+		with timed("data.widgets"):
+			self.transaction_list.data = rows
 
-		if(tr_num == 0):
-			self.transaction_list.rows = 1
-			card = TransactionCard(
-				name = f"No transactions", **card_kw
-			)
-			self.transaction_list.add_widget(card)
-			card.load()
+	def load_next_page(self):
+		'''Appends the next page of transactions to the list'''
+		if self.rows is None or self.loaded >= self.rows.shape[0]:
 			return
+		stop = min(self.rows.shape[0], self.loaded + int(self.page_size))
+		interaction("data.next_page")
+		view = self.transaction_list
+		layout = view.layout_manager
+		# rows above the top of the view, which stay in place as the list grows
+		top = (1 - view.scroll_y) * max(layout.height - view.height, 0)
+		self.page_binding = layout.fbind('height', self.restore_scroll, top)
+		with timed("data.rows"):
+			rows = DataScreen.row_data(self.rows.iloc[self.loaded:stop])
+		with timed("data.widgets"):
+			view.data.extend(rows)
+		self.loaded = stop
 
-		self.transaction_list.rows = tr_num
-		for tr in dates.iterrows():
-			_, data = tr
-			card = TransactionCard(
-				name   = data['Transaction Description'],
-				amount = data['amount'],
-				**card_kw
-			)
-			self.transaction_list.add_widget(card)
-			card.load()
+	def restore_scroll(self, top, layout, height):
+		'''Keeps the same rows in view once a new page has been laid out'''
+		self.cancel_page()
+		view = self.transaction_list
+		scrollable = height - view.height
+		if scrollable > 0:
+			view.scroll_y = min(max(1 - top / scrollable, 0), 1)
+
+	def cancel_page(self):
+		if self.page_binding is not None:
+			self.transaction_list.layout_manager.unbind_uid('height', self.page_binding)
+			self.page_binding = None
+
+	def on_list_scroll(self, instance, scroll_y):
+		# one page at a time, the next one once this one is laid out
+		if self.page_binding is not None:
+			return
+		# pixels between the bottom of the view and the end of the list
+		scrollable = max(instance.layout_manager.height - instance.height, 0)
+		if scroll_y * scrollable < instance.height:
+			self.load_next_page()
 
 	def on_pre_enter(self):
 		self.load_transactions()
-		
\ No newline at end of file
@@ -0,0 +1,158 @@
+import os
+import calendar
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+
+DATA_DIR = "data"
+
+# Fewer files than this are parsed one after the other,
+# since starting worker processes would take longer.
+PARALLEL_MIN_FILES = 8
+
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+WEEKDAY_NAMES = list(calendar.day_name)
+
+# Text columns with few distinct values, stored as categories
+CATEGORY_COLUMNS = [
+	'Transaction Type',
+	'Sort Code',
+	'Account Number',
+	'Transaction Description',
+]
+
+
+def derive_date_columns(dataset: pd.DataFrame) -> pd.DataFrame:
+	'''Extracts month, day, year and weekday from the datetime column'''
+	dates = dataset['datetime'].dt
+
+	# extract inidividual date components
+	dataset['month'] = pd.Categorical.from_codes(dates.month - 1, MONTH_NAMES)
+	dataset['day']  = dates.day
+	dataset['year'] = dates.year
+
+	# extract weekdays names
+	dataset['weekday'] = pd.Categorical.from_codes(dates.weekday, WEEKDAY_NAMES)
+	return dataset
+
+
+def cleanup_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
+	'''Renames bank export columns and derives date components and amounts'''
+	# simplify column names
+	names = {
+		'Transaction Date' : 'date',
+		'Balance'          : 'balance',
+		'Debit Amount'     : 'expense',
+		'Credit Amount'    : 'income'
+	}
+	dataset = dataset.rename(names, axis='columns')
+
+	# generate datetime objects
+	dataset['datetime'] = pd.to_datetime(dataset['date'], format="%d/%m/%Y")
+	dataset = derive_date_columns(dataset)
+
+	# calculate transaction amounts (negative is expense, positive is income)
+	debit  = dataset['expense'].to_numpy(dtype=float)
+	credit = dataset['income'].to_numpy(dtype=float)
+	dataset['amount'] = np.where(np.isnan(debit), credit, -debit)
+
+	dataset['expense'] = dataset['expense'].fillna(0.0)
+	dataset['income'] = dataset['income'].fillna(0.0)
+	return dataset
+
+
+def compact_dataset(dataset: pd.DataFrame) -> pd.DataFrame:
+	'''
+	Shrinks a cleaned dataset to use less memory: the date text is dropped
+	in favour of the datetime column, repeated text becomes categorical,
+	and date components use small integers.
+	Text is formatted from the datetime column when it is displayed.
+	'''
+	dataset = dataset.drop(columns=['date'], errors='ignore')
+	for column in CATEGORY_COLUMNS:
+		if column in dataset:
+			dataset[column] = dataset[column].astype('category')
+	dataset['day'] = dataset['day'].astype(np.int8)
+	dataset['year'] = dataset['year'].astype(np.int16)
+	# amounts and balances stay float64, float32 no longer holds
+	# whole pence above about £131k
+	return dataset
+
+
+def load_csv(path: str) -> pd.DataFrame:
+	'''Parses and cleans a single csv file'''
+	return cleanup_dataset(pd.read_csv(path))
+
+
+def to_arrays(dataframe: pd.DataFrame) -> dict:
+	'''
+	Splits a dataframe into typed numpy arrays, which are cheaper to send
+	between processes. Categorical columns are sent as their codes.
+	'''
+	arrays = dict()
+	for name, column in dataframe.items():
+		if isinstance(column.dtype, pd.CategoricalDtype):
+			arrays[name] = (column.cat.codes.to_numpy(), list(column.cat.categories))
+		else:
+			arrays[name] = column.to_numpy()
+	return arrays
+
+
+def from_arrays(arrays: dict) -> pd.DataFrame:
+	'''Rebuilds a dataframe split with to_arrays'''
+	columns = dict()
+	for name, values in arrays.items():
+		if isinstance(values, tuple):
+			codes, categories = values
+			values = pd.Categorical.from_codes(codes, categories)
+		columns[name] = values
+	return pd.DataFrame(columns)
+
+
+def load_csv_arrays(path: str) -> dict:
+	'''Parses and cleans a single csv file in a worker process'''
+	return to_arrays(load_csv(path))
+
+
+def load_csv_files(paths: List[str], workers: int = None) -> List[pd.DataFrame]:
+	'''
+	Parses and cleans several csv files, returning them in the same order.
+	Files are spread across a pool of processes, unless there are fewer
+	than PARALLEL_MIN_FILES of them or `workers` is 1. If the pool
+	can't be used, they are parsed one after the other instead.
+	'''
+	if workers is None:
+		workers = os.cpu_count() or 1
+	workers = min(workers, len(paths))
+	if workers <= 1 or len(paths) < PARALLEL_MIN_FILES:
+		return [load_csv(path) for path in paths]
+
+	try:
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			results = pool.map(load_csv_arrays, paths)
+			return [from_arrays(arrays) for arrays in results]
+	except (BrokenProcessPool, OSError, NotImplementedError, ImportError):
+		# a worker died, or the platform can't start processes (e.g. Android)
+		return [load_csv(path) for path in paths]
+
+
+def concat_datasets(dataframes: List[pd.DataFrame]) -> pd.DataFrame:
+	'''
+	Joins compacted datasets one after the other. Categorical columns are
+	given the same categories first, since pandas would otherwise turn
+	categories that differ between the frames into plain text.
+	'''
+	dataframes = [df.copy(deep = False) for df in dataframes]
+	for column in dataframes[0].columns:
+		if not isinstance(dataframes[0][column].dtype, pd.CategoricalDtype):
+			continue
+		categories = pd.api.types.union_categoricals(
+			[df[column] for df in dataframes], ignore_order = True).categories
+		for df in dataframes:
+			df[column] = df[column].cat.set_categories(categories)
+	return pd.concat(dataframes, ignore_index = True)
@@ -1,62 +1,150 @@
-
-from kivymd.uix.label import MDLabel
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.gridlayout import MDGridLayout
 
 from kivy.properties import *
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.uix.widget import Widget
 
-from kivy.garden.matplotlib.backend_kivyagg import FigureCanvasKivyAgg
-
-from typing import List, Tuple, Union
+import copy
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Tuple
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-from matplotlib.lines import Line2D
-import matplotlib.dates as mdates
-import matplotlib as mpl
-mpl.use("module://kivy.garden.matplotlib.backend_kivy")
+
+from profiling import profiler, timed
+
+
+# Matplotlib backend of new figures, scripts without a window may use "agg"
+BACKEND = "module://kivy.garden.matplotlib.backend_kivy"
+
+# Memory given to the textures of plots shown before, see TextureCache
+TEXTURE_CACHE_BYTES = 64 * 2**20
+
+
+def pyplot():
+	'''
+	Imports matplotlib.pyplot with the backend set in BACKEND.
+	Matplotlib is only loaded once a figure is needed, to keep startup fast.
+	'''
+	import matplotlib as mpl
+	mpl.use(BACKEND)
+	import matplotlib.pyplot as plt
+	return plt
 
 
 class PlotDataLabels():
-	''' Renders hovering annotations over a data point in a plot'''
+	'''
+	Renders hovering annotations over a data point in a plot
 
-	@staticmethod
-	def hover_callback(event, fig, ax, labelbox, lines, xdata, ydata, fmt):
-		''' Callback for mouse hovering over a plot '''
-		visible = labelbox.get_visible()
+	The nearest data point is found with a binary search over the sorted
+	x values of the line. If the canvas supports blitting, the rest of the
+	figure is cached after each draw and only the annotation is redrawn
+	when the mouse moves, instead of rendering the whole figure again.
+	'''
 
-		if event.inaxes != ax:
+	def __init__(self, fig, ax, labelbox, lines, xdata, ydata, fmt, blit = True):
+		self.fig = fig
+		self.ax = ax
+		self.labelbox = labelbox
+		self.lines = lines
+		self.xdata = xdata
+		self.ydata = ydata
+		self.fmt = fmt
+		self.index = None
+		self.background = None
+
+		# x values sorted once so that lookups are a binary search
+		x = np.asarray(lines.convert_xunits(lines.get_xdata()), dtype=float)
+		self.order = np.argsort(x, kind='stable')
+		self.xsorted = x[self.order]
+
+		canvas = fig.canvas
+		self.blit = blit and getattr(canvas, 'supports_blit', False)
+		# matplotlib only holds bound methods weakly, lambdas keep
+		# the labels alive for as long as the canvas
+		if self.blit:
+			# drawn by hand on top of the cached background
+			labelbox.set_animated(True)
+			canvas.mpl_connect('draw_event', lambda event: self.on_draw(event))
+		canvas.mpl_connect('motion_notify_event', lambda event: self.hover_callback(event))
+
+	def on_draw(self, event):
+		'''Caches the figure without the annotation'''
+		self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+		if self.labelbox.get_visible():
+			self.ax.draw_artist(self.labelbox)
+
+	def nearest(self, event):
+		'''Returns the index of the data point under the mouse, or None'''
+		if event.xdata is None or self.xsorted.shape[0] == 0:
+			return None
+		# points within the line's pick radius, in pixels
+		radius = self.lines.get_pickradius()
+		to_data = self.ax.transData.inverted()
+		xmin = to_data.transform((event.x - radius, event.y))[0]
+		xmax = to_data.transform((event.x + radius, event.y))[0]
+		lo = np.searchsorted(self.xsorted, min(xmin, xmax), side='left')
+		hi = np.searchsorted(self.xsorted, max(xmin, xmax), side='right')
+		if lo == hi:
+			return None
+
+		indices = self.order[lo:hi]
+		pixels = self.ax.transData.transform(self.lines.get_xydata()[indices])
+		dist = (pixels[:,0] - event.x)**2 + (pixels[:,1] - event.y)**2
+		best = np.argmin(dist)
+		if dist[best] > radius**2:
+			return None
+		return indices[best]
+
+	def hover_callback(self, event):
+		''' Callback for mouse hovering over a plot '''
+		if event.inaxes != self.ax:
 			return
 
-		# pandas objects are indexed with extra variable iloc[]
-		x_is_pd = isinstance(xdata, (pd.DataFrame,pd.Series))
-		y_is_pd = isinstance(ydata, (pd.DataFrame,pd.Series))
-
-		contained, index = lines.contains(event)
-		if contained:
-			ind = index['ind'][0]
-			x,y = lines.get_data()
-			xp = xdata.iloc[ind] if x_is_pd else xdata[ind]
-			yp = ydata.iloc[ind] if y_is_pd else ydata[ind]
-			labelbox.xy = (x[ind], y[ind])
-			labelbox.set_text(fmt(xp,yp))
-			labelbox.set_visible(True)
-			fig.canvas.draw_idle()
-		elif visible:
-			labelbox.set_visible(False)
-			fig.canvas.draw_idle()
+		ind = self.nearest(event)
+		if ind == self.index:
+			return
+		self.index = ind
+
+		if ind is not None:
+			# pandas objects are indexed with extra variable iloc[]
+			x_is_pd = hasattr(self.xdata, 'iloc')
+			y_is_pd = hasattr(self.ydata, 'iloc')
+			xp = self.xdata.iloc[ind] if x_is_pd else self.xdata[ind]
+			yp = self.ydata.iloc[ind] if y_is_pd else self.ydata[ind]
+			x, y = self.lines.get_data()
+			self.labelbox.xy = (x[ind], y[ind])
+			self.labelbox.set_text(self.fmt(xp,yp))
+		self.labelbox.set_visible(ind is not None)
+		self.update()
+
+	def update(self):
+		'''Redraws the annotation'''
+		canvas = self.fig.canvas
+		if not self.blit or self.background is None:
+			canvas.draw_idle()
+			return
+		canvas.restore_region(self.background)
+		if self.labelbox.get_visible():
+			self.ax.draw_artist(self.labelbox)
+		canvas.blit(self.fig.bbox)
 
 
 	@staticmethod
 	def show(fig, axs, lines, xdata, ydata, **kwargs):
-		''' Enables hovering annotations over pointed data point '''
-		# custom keyword - does not belong to axis.annotate
+		'''
+		Enables hovering annotations over pointed data point.
+		Set `blit` to False to redraw the whole figure on each mouse move.
+		'''
+		# custom keywords - do not belong to axis.annotate
 		fmt = kwargs.pop('fmt')
+		blit = kwargs.pop('blit', True)
 		# Overwrite text and xy
-		kwargs['text'] = '',	
-		kwargs['xy']   = (0,0),
+		kwargs['text'] = ''
+		kwargs['xy']   = (0,0)
 		# Defaults for the others
 		kwargs.setdefault('textcoords', 'offset points')
 		kwargs.setdefault('xytext',     (15,15))
@@ -67,10 +155,85 @@ class PlotDataLabels():
 		labelbox = axs.annotate(**kwargs)
 		labelbox.set_visible(False)
 
-		callback = lambda event: PlotDataLabels.hover_callback(
-			event, fig, axs, labelbox, lines, xdata, ydata, fmt)
-		fig.canvas.mpl_connect('motion_notify_event', callback)
+		return PlotDataLabels(fig, axs, labelbox, lines, xdata, ydata, fmt, blit = blit)
+
+
 
+class TextureCache():
+	'''
+	Textures of rendered plots, so that showing a plot again
+	doesn't need to draw it again. The least recently used textures
+	are dropped once they take more than `max_bytes`.
+
+	Textures belong to a version of the dataset, see TransactionStore.version,
+	and all of them are dropped when one of another version is used.
+
+	Parameters
+	----------
+		max_bytes:	(int) Memory the textures may take
+	'''
+
+	def __init__(self, max_bytes: int = TEXTURE_CACHE_BYTES):
+		self.max_bytes = max_bytes
+		self.textures = OrderedDict()
+		self.nbytes = 0
+		self.version = None
+
+	@staticmethod
+	def texture_bytes(texture) -> int:
+		width, height = texture.size
+		return width * height * 4
+
+	def use_version(self, version):
+		if version != self.version:
+			self.clear()
+			self.version = version
+
+	def get(self, key, version):
+		'''Returns the texture stored under a key, or None'''
+		self.use_version(version)
+		texture = self.textures.get(key)
+		if texture is not None:
+			self.textures.move_to_end(key)
+		return texture
+
+	def put(self, key, texture, version):
+		self.use_version(version)
+		if key in self.textures:
+			self.nbytes -= TextureCache.texture_bytes(self.textures.pop(key))
+		self.textures[key] = texture
+		self.nbytes += TextureCache.texture_bytes(texture)
+		while self.nbytes > self.max_bytes and len(self.textures) > 1:
+			_, oldest = self.textures.popitem(last = False)
+			self.nbytes -= TextureCache.texture_bytes(oldest)
+
+	def clear(self):
+		self.textures.clear()
+		self.nbytes = 0
+
+
+texture_cache = TextureCache()
+
+
+def downsample_minmax(y, buckets: int):
+	'''
+	Reduces a series to at most four points per bucket of consecutive
+	values: the first, last, lowest and highest. This keeps the shape
+	of the line, including its peaks, while bounding the number of points.
+	Returns the indices of the kept points.
+	'''
+	y = np.asarray(y, dtype=float)
+	n = y.shape[0]
+	if buckets <= 0 or n <= 4 * buckets:
+		return np.arange(n)
+
+	edges = np.linspace(0, n, buckets + 1).astype(int)
+	first, last = edges[:-1], edges[1:] - 1
+	ids = np.repeat(np.arange(buckets), np.diff(edges))
+
+	# within each bucket, values sorted ascending: lowest first, highest last
+	order = np.lexsort((y, ids))
+	return np.unique(np.concatenate([first, last, order[first], order[last]]))
 
 
 class PlotWidget(MDBoxLayout):
@@ -92,23 +255,84 @@ class PlotWidget(MDBoxLayout):
 	MyApp.run()
 	'''
 	
+	persistent = BooleanProperty(True)
+	'''
+	If True, the canvas widget is created once and later calls to show()
+	only redraw it. Otherwise a new canvas widget is created every time.
+	'''
+
+	min_points = NumericProperty(400)
+	'''Number of points always drawn before downsampling, see plot()'''
+
+	render_mode = OptionProperty("canvas", options = ["canvas", "thread"])
+	'''
+	How show() draws the figure. With "canvas" it is drawn on the UI thread
+	by the kivy matplotlib backend. With "thread" it is rasterized by Agg
+	on a worker thread, and the pixels are copied into a texture once ready,
+	so that touches are handled while it draws. Each render draws a copy of
+	the figure, and renders that finish after a newer one was requested
+	are dropped.
+	Hover labels need the "canvas" mode. Set the mode before the figure is used.
+	'''
+
 	def __init__(self, *args, **kwargs):
 		'''Arguments solely for the MDBoxLayout parent class'''
 		
 		# remove kwarg if existing so that kivy doesn't complain
-		subplot_kw = kwargs.pop("subplot_kw", dict())
+		self.subplot_kw = kwargs.pop("subplot_kw", dict())
+		self.register_event_type('on_stale')
 		super().__init__(*args, **kwargs)
 
-		self.fig, self.ax = plt.subplots(1,1, subplot_kw = subplot_kw)
-		self.show()
+		self.plot_widget = None
+		self.artists = dict()
+		# thread mode: the number of the latest render requested,
+		# and the texture its pixels are copied into
+		self.generation = 0
+		self.texture = None
+		# the texture is in texture_cache, so it can't be drawn into again
+		self.texture_cached = False
+		# selection and version on screen, and those the figure holds,
+		# which differ after show_cached()
+		self.shown = self.drawn = (None, None)
+		self.theme = None
+		self.resize_trigger = Clock.create_trigger(lambda dt: self.show(*self.shown))
+		self.stale_trigger = Clock.create_trigger(lambda dt: self.dispatch('on_stale', *self.shown))
+		self.fbind('size', self.on_resize)
+		# the figure is created the first time it is used,
+		# and the canvas widget the first time it is shown
+		self._fig = self._ax = None
+
+	@property
+	def fig(self):
+		if self._fig is None:
+			self.create_figure()
+		return self._fig
+
+	@property
+	def ax(self):
+		if self._ax is None:
+			self.create_figure()
+		return self._ax
+
+	@timed("plot.create_figure")
+	def create_figure(self):
+		if self.render_mode == "thread":
+			# a figure of its own, pyplot keeps global state that isn't thread safe
+			from matplotlib.figure import Figure
+			from matplotlib.backends.backend_agg import FigureCanvasAgg
+			self._fig = Figure()
+			FigureCanvasAgg(self._fig)
+			self._ax = self._fig.add_subplot(1,1,1, **self.subplot_kw)
+		else:
+			self._fig, self._ax = pyplot().subplots(1,1, subplot_kw = self.subplot_kw)
 
 		# Fit plot to box layout
-		self.fig.tight_layout(pad=5)
+		self._fig.tight_layout(pad=5)
 
 		 # This hides the white square that would appear on the bottom left
-		self.fig.patch.set_alpha(0.0)
-
+		self._fig.patch.set_alpha(0.0)
 		
+	@timed("plot.plot")
 	def plot(self, *args, **kwargs):
 		'''
 		Produces figure canvas widget, allows replotting.
@@ -124,17 +348,28 @@ class PlotWidget(MDBoxLayout):
 							be shown using default parameters.
 							*See below for a list of accepted parameters
 							for hover_labels.
+			downsample:		bool, optional
+							When x and y hold more points than the widget is
+							wide in pixels, only the first, last, lowest and
+							highest points of each group of neighbours are drawn.
+							True by default.
 
 		*Parameters for hover_labels:
 			fmt:			callable, optional
 							Function that receives the x,y values of a data point
 							and returns a formatted string.
 							By default, it is set to `lambda x,y: f"{x}\n{y}"`.
+			blit:			bool, optional
+							Redraw only the annotation when the mouse moves.
+							True by default.
 			Additional arguments sent to Axis.annotate,
 			except 'text' and 'xy', which will be overwritten.
 		'''
 
 		hover_labels = kwargs.pop("hover_labels", None)
+		downsample = kwargs.pop("downsample", True)
+		if downsample and len(args) >= 2:
+			args = self.downsample(*args)
 		line_info = self.ax.plot(*args, **kwargs)
 
 		if not isinstance(hover_labels, dict):
@@ -144,19 +379,216 @@ class PlotWidget(MDBoxLayout):
 		hover_labels.setdefault("fmt", lambda x,y: f"{x}\n{y}")
 		x = line._xorig
 		y = line._yorig
-		PlotDataLabels.show(self.fig, self.ax, line, x, y, **hover_labels)
+		self.data_labels = PlotDataLabels.show(
+			self.fig, self.ax, line, x, y, **hover_labels)
 		
 
-	def show(self):
-		'''Creates a widget from the plot data'''
+	def downsample(self, x, y, *args):
+		'''Bounds the number of points to about the width of the widget'''
+		# before the first layout the widget width isn't known yet
+		points = max(int(self.width), self.min_points)
+		if len(x) <= points:
+			return (x, y, *args)
+		keep = downsample_minmax(y, points // 4)
+		# pandas objects are indexed with extra variable iloc[]
+		take = lambda v: v.iloc[keep] if hasattr(v, 'iloc') else np.asarray(v)[keep]
+		return (take(x), take(y), *args)
+
+	def show(self, selection = None, version = None):
+		'''
+		Creates a widget from the plot data, or redraws the existing one.
+		In thread mode, when given the selection the plot shows and the version
+		of its data, the rendered texture is kept so that show_cached()
+		can show it again without drawing.
+		'''
+		if self.render_mode == "thread":
+			self.render_in_background(selection, version)
+			return
+		if self.persistent and self.plot_widget is not None \
+			and self.plot_widget.parent is self:
+			self.plot_widget.draw_idle()
+			return
 		self.clear_widgets()
-		self.plot_widget = FigureCanvasKivyAgg(figure = self.fig)
-		self.add_widget(self.plot_widget)
+		with timed("plot.create_canvas"):
+			from kivy.garden.matplotlib.backend_kivyagg import FigureCanvasKivyAgg
+			self.plot_widget = FigureCanvasKivyAgg(figure = self.fig)
+			self.add_widget(self.plot_widget)
+		if profiler.enabled:
+			# drawing may be deferred, so the draw itself is timed
+			self.plot_widget.draw = timed("plot.draw")(self.plot_widget.draw)
+
+	def cache_key(self, selection, version) -> tuple:
+		size = (max(int(self.width), 1), max(int(self.height), 1))
+		return (self.uid, selection, self.theme, size, version)
+
+	def show_cached(self, selection, version) -> bool:
+		'''
+		Shows the texture rendered before for a selection and data version,
+		see show(). Returns False if there isn't one, and the plot must be drawn.
+		'''
+		if self.render_mode != "thread" or self.plot_widget is None or selection is None:
+			return False
+		texture = texture_cache.get(self.cache_key(selection, version), version)
+		if texture is None:
+			return False
+		# the render in progress, if any, is for another selection
+		self.generation += 1
+		self.shown = (selection, version)
+		self.show_texture(texture, cached = True)
+		return True
+
+	def render_in_background(self, selection = None, version = None):
+		'''Starts rasterizing the figure on a worker thread, see render_mode'''
+		fig = self.fig
+		self.generation += 1
+		self.shown = self.drawn = (selection, version)
+		key = self.cache_key(selection, version) if selection is not None else None
+		if self.plot_widget is None or self.plot_widget.parent is not self:
+			self.clear_widgets()
+			self.plot_widget = Widget()
+			with self.plot_widget.canvas:
+				Color(1, 1, 1, 1)
+				self.plot_widget.rect = Rectangle()
+			self.plot_widget.bind(
+				pos = lambda w, pos: setattr(w.rect, 'pos', pos),
+				size = lambda w, size: setattr(w.rect, 'size', size))
+			self.add_widget(self.plot_widget)
+
+		# render at the size of the widget, one figure pixel per screen pixel
+		width, height = max(int(self.width), 1), max(int(self.height), 1)
+		fig.set_size_inches(width / fig.dpi, height / fig.dpi)
+		# the worker draws a copy, so the figure can be changed for the next
+		# render straight away, and a render that is no longer wanted
+		# finishes on its own and is dropped by upload()
+		with timed("plot.snapshot"):
+			snapshot = copy.deepcopy(fig)
+		threading.Thread(target = self.render,
+			args = (snapshot, self.generation, key, version), daemon = True).start()
+
+	def render(self, fig, generation: int, key = None, version = None):
+		'''Rasterizes a copy of the figure, on a worker thread'''
+		from matplotlib.backends.backend_agg import FigureCanvasAgg
+		with timed("plot.render"):
+			# copies lose their canvas
+			FigureCanvasAgg(fig)
+			fig.canvas.draw()
+			# copied, the buffer is reused by the next draw
+			pixels = bytes(fig.canvas.buffer_rgba())
+			size = fig.canvas.get_width_height()
+		Clock.schedule_once(
+			partial(self.upload, generation, pixels, size, key, version), 0)
+
+	def upload(self, generation: int, pixels: bytes, size, key, version, *largs):
+		'''Copies the pixels of a finished render into the texture, on the UI thread'''
+		if generation != self.generation:
+			# a newer render has been requested since
+			return
+		with timed("plot.upload"):
+			texture = self.texture
+			if texture is None or self.texture_cached or tuple(texture.size) != tuple(size):
+				texture = Texture.create(size = size, colorfmt = 'rgba')
+				# Agg rows start at the top, texture rows at the bottom
+				texture.flip_vertical()
+			texture.blit_buffer(pixels, colorfmt = 'rgba', bufferfmt = 'ubyte')
+			if key is not None:
+				texture_cache.put(key, texture, version)
+			self.show_texture(texture, cached = key is not None)
+
+	def show_texture(self, texture, cached: bool):
+		self.texture = texture
+		self.texture_cached = cached
+		self.plot_widget.rect.texture = texture
+		self.plot_widget.canvas.ask_update()
+
+	def on_resize(self, *largs):
+		# thread mode renders at the size of the widget, so it's rendered again,
+		# by the owner if a cached texture of other data than the figure's is shown
+		if self.render_mode != "thread" or self.texture is None:
+			return
+		if self.shown == self.drawn:
+			self.resize_trigger()
+		else:
+			self.stale_trigger()
+
+	def on_stale(self, selection, version):
+		'''
+		Fired in thread mode when the widget is resized while showing a cached
+		texture, see show_cached(). The figure holds other data, so the owner
+		has to plot the selection again for it to be drawn at the new size.
+		'''
+		pass
 
 	def clear(self):
 		'''Removes the plotted data'''
 		# don't use fig.clear(), it will delete the axes as well
 		self.ax.clear()
+		self.artists.clear()
+
+	def add_artist(self, name: str, artist):
+		'''
+		Registers an artist under a name so that it can be updated later
+		instead of being removed and drawn again. Returns the artist.
+		'''
+		self.artists[name] = artist
+		return artist
+
+	def get_artist(self, name: str):
+		'''Returns a registered artist, or None if there isn't one'''
+		return self.artists.get(name)
+
+	def add_line(self, name: str, **kwargs):
+		'''
+		Creates an empty line and registers it under a name.
+		Keyword arguments are the same as for plt.plot().
+		Use set_line_data() to give it values.
+		'''
+		line, = self.ax.plot([], [], **kwargs)
+		return self.add_artist(name, line)
+
+	def set_line_data(self, name: str, x, y, autoscale: bool = True):
+		'''
+		Replaces the values of a registered line.
+		If autoscale is True, the axis limits are fitted to the new values.
+		'''
+		self.artists[name].set_data(x, y)
+		if autoscale:
+			self.ax.relim()
+			self.ax.autoscale_view()
+
+	def add_guide(self, name: str, **kwargs):
+		'''
+		Creates a horizontal line across the plot and registers it under a name.
+		Keyword arguments are the same as for Axes.axhline().
+		'''
+		return self.add_artist(name, self.ax.axhline(0, **kwargs))
+
+	def set_guide(self, name: str, y: float):
+		self.get_artist(name).set_ydata([y, y])
+
+	def add_label(self, name: str, **kwargs):
+		'''
+		Creates an empty text label and registers it under a name.
+		Keyword arguments are the same as for Axes.text().
+		'''
+		return self.add_artist(name, self.ax.text(0, 0, "", **kwargs))
+
+	def set_label(self, name: str, x: float, y: float, text: str):
+		'''Moves a registered label to a data point and changes its text'''
+		label = self.get_artist(name)
+		label.set_position((x, y))
+		label.set_text(text)
+
+	def set_xlim(self, lo: float, hi: float):
+		self.ax.set_xlim(lo, hi)
+
+	def set_ylim(self, lo: float, hi: float):
+		self.ax.set_ylim(lo, hi)
+
+	def hide_axes(self):
+		'''Hides the axis lines, ticks and their labels'''
+		self.ax.axis('off')
+		self.ax.set_xticks([])
+		self.ax.set_yticks([])
 
 	def set_theme(self, theme: str):
 		'''Quick theming - 'dark' or 'light' '''
@@ -169,6 +601,7 @@ class PlotWidget(MDBoxLayout):
 			axcolor = "white"
 		else:
 			raise ValueError("theme can only be 'dark' or 'light'")
+		self.theme = theme
 
 		self.ax.set_facecolor(axcolor) # Graph area
 		self.ax.tick_params(axis='x', colors=color, labelsize=12)
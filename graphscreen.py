@@ -1,33 +1,14 @@
-
-from multiprocessing.managers import DictProxy
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.gridlayout import MDGridLayout
-from kivymd.uix.floatlayout import MDFloatLayout
-from kivymd.uix.label import MDLabel
+from kivymd.uix.menu import MDDropdownMenu
 from kivy.properties import (
 	NumericProperty,
 	OptionProperty,
 	ObjectProperty,
-	StringProperty,
-	BooleanProperty,
-	ListProperty,
-	VariableListProperty,
-	ReferenceListProperty,
 )
 
-from kivy.properties import *
-
-from kivymd.uix.button import MDTextButton, MDFlatButton, MDRaisedButton
-from kivy.uix.dropdown import DropDown
-from kivy.uix.button import Button
-from kivy.uix.spinner import Spinner
-from kivymd.uix.dropdownitem import MDDropDownItem
-from kivymd.uix.menu import MDDropdownMenu
-
-from graph import *
-
 from functools import partial
+from profiling import timed, interaction
+from scheduler import scheduler
 import calendar
 import datetime as dt
 
@@ -62,8 +43,46 @@ class GraphScreen(MDScreen):
 
 	each_day = ObjectProperty(None)
 
+	store = ObjectProperty(None, allownone = True)
+	'''Transactions indexed by date, None while the dataset is loading'''
+
+	year = NumericProperty(None, allownone = True)
+	'''Year whose months are shown when choosing a single month'''
+
 	theme_str = OptionProperty("Light", options = ["Dark", "Light"])
 
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		# kind of plot, "month" or "year", and the menu entry chosen
+		self.selection = ("month", "All Year")
+		# version of the data the menus were built for
+		self.menus_version = None
+
+	def on_dataset_ready(self, app):
+		# also when transactions are imported, which may hold a new year
+		if self.manager is not None and self.manager.current == self.name:
+			self.on_pre_enter()
+
+	def request_plot(self):
+		'''Plots the selection on the next frame, unless it is the one shown'''
+		version = self.store.version if self.store is not None else None
+		scheduler.request(self, self.plot_selection,
+			(self.selection, self.year, version, self.theme_str))
+
+	def replot(self):
+		'''Plots the selection again on the next frame, even if it is the one shown'''
+		scheduler.invalidate(self)
+		self.request_plot()
+
+	def plot_selection(self):
+		if self.store is None:
+			return
+		kind, text = self.selection
+		if kind == "month":
+			self.plot_month(text)
+		else:
+			self.plot_year(text)
+
 	def setup_month_menu(self):
 		month_options = ["All Year"] + [calendar.month_name[i] for i in range(1,13)]
 
@@ -82,43 +101,61 @@ class GraphScreen(MDScreen):
 		)
 	
 	def on_month_select(self, text):
+		interaction("graph.month_select")
+		self.selection = ("month", text)
 		self.ids.month_selection.text = text
-		self.balance_plot.clear()
+		self.request_plot()
+
+	def plot_month(self, text):
+		import matplotlib.dates as mdates
 
 		# Display the data for one full year
 		if (text == "All Year"):
-			x = [ dt.datetime.strptime(d, "%d/%m/%Y")
-				  for d in self.each_day['date']]
-			y = list(self.each_day['balance'])
+			x = self.store.each_day['datetime']
+			y = self.store.each_day['balance']
+		
+		# Display the data for a single month
+		else:
+			if text in calendar.month_name[1:]:
+				month = list(calendar.month_name).index(text)
+				with timed("graph.filter"):
+					days = self.store.month(self.year, month, daily = True)
+			else:
+				days = self.store.each_day.iloc[:0]
+			x = days['day']
+			y = days['balance']
+		if len(list(x)) == 0:
+			self.ids.label_no_data.text = "No data to display"
+		else:
+			self.ids.label_no_data.text = ""
 
+		# selections seen before are shown again without drawing
+		selection = ("month", self.year, text)
+		if self.balance_plot.show_cached(selection, self.store.version):
+			return
+
+		self.balance_plot.clear()
+		if (text == "All Year"):
 			# format the time axis using month abbreviations on each 15th day.
 			self.balance_plot.ax.xaxis.set_major_locator(
 				mdates.MonthLocator(bymonthday=15))
 			self.balance_plot.ax.xaxis.set_major_formatter(
 				mdates.DateFormatter('%b'))
 			label_fmt = lambda x,y: f"{x.strftime('%b %d')}\n£{y:.2f}"
-		
-		# Display the data for a single month
 		else:
-			idx = self.each_day['month'] == text
-			x = self.each_day['day'][idx]
-			y = self.each_day['balance'][idx]
 			# Choose roughly the days at the beginning of each week plus the last one
 			xticks = [1, 7, 14, 21, 29]
 			self.balance_plot.ax.set_xticks(xticks)
-		if len(list(x)) == 0:
-			self.ids.label_no_data.text = "No data to display"
-		else:
-			self.ids.label_no_data.text = ""
 
-		self.balance_plot.plot(x, y, c='cyan', marker='o', ms=8, mec='k', lw=3)
-			# hover_labels = dict(fmt = label_fmt))
+		with timed("graph.plot"):
+			self.balance_plot.plot(x, y, c='cyan', marker='o', ms=8, mec='k', lw=3)
+				# hover_labels = dict(fmt = label_fmt))
 		self.balance_plot.ax.set_xlabel(text, fontsize=15, c="white")
 		self.balance_plot.ax.grid(visible=True, axis='y', c='white', alpha=0.5)
-		self.balance_plot.show()
+		self.balance_plot.show(selection, self.store.version)
 
 	def setup_year_menu(self):
-		years = sorted(self.each_day['year'].unique())
+		years = self.store.years()
 		year_options = ['All'] + [str(y) for y in years]
 
 		year_items = [ dict(
@@ -135,33 +172,57 @@ class GraphScreen(MDScreen):
 		)
 
 	def on_year_select(self, text):
+		interaction("graph.year_select")
+		self.selection = ("year", text)
 		self.ids.year_selection.text = text
+		if text != "All":
+			self.year = int(text)
+		self.request_plot()
+
+	def plot_year(self, text):
+		import matplotlib.dates as mdates
+
+		selection = ("year", text)
+		if self.balance_plot.show_cached(selection, self.store.version):
+			return
 		self.balance_plot.clear()
 
-		if (text == "All"):
-			x = self.each_day['date']
-			y = self.each_day['balance']
-		else:
-			idx = self.each_day['year'] == int(text)
-			x = self.each_day['date'][idx]
-			y = self.each_day['balance'][idx]
+		with timed("graph.filter"):
+			if (text == "All"):
+				days = self.store.each_day
+			else:
+				days = self.store.year(self.year, daily = True)
+		x = days['datetime']
+		y = days['balance']
 		
-		self.balance_plot.plot(x, y, c='cyan', marker='o', ms=8, mec='k', lw=3)
+		with timed("graph.plot"):
+			self.balance_plot.plot(x, y, c='cyan', marker='o', ms=8, mec='k', lw=3)
 		self.balance_plot.ax.set_xlabel(text, fontsize=15, c="white")
 		self.balance_plot.ax.grid(visible=True, axis='y', c='white', alpha=0.5)
-		self.balance_plot.ax.set_xticks([1, 7, 14, 21, 28])
-		self.balance_plot.show()
+		self.balance_plot.ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+		self.balance_plot.ax.xaxis.set_major_formatter(
+			mdates.DateFormatter('%b' if text != "All" else '%b %y'))
+		self.balance_plot.show(selection, self.store.version)
 
 	def on_pre_enter(self):
 		self.balance_plot = self.ids.balance_plot
 		self.balance_plot.set_theme(self.theme_str.lower())
-
-		self.setup_month_menu()
-		self.setup_year_menu()
-
-		# set initial plot option
-		self.on_month_select("2022")
-		self.on_month_select("All Year")
+		if self.store is None:
+			self.ids.label_no_data.text = "Loading..."
+			return
+		if self.year is None:
+			years = self.store.years()
+			self.year = years[-1] if years else dt.datetime.now().year
+
+		if self.menus_version != self.store.version:
+			with timed("graph.menus"):
+				self.setup_month_menu()
+				self.setup_year_menu()
+			self.menus_version = self.store.version
+
+		# the selection is kept when coming back to the screen,
+		# and only plotted again if the data has changed
+		self.request_plot()
 
 
 
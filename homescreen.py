@@ -2,10 +2,15 @@
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.gridlayout import MDGridLayout
 from kivy.clock import Clock as KivyClock
+from kivy.properties import ObjectProperty
 
-from monthpicker import *
+import datetime as dt
+import calendar
 from functools import partial
-import numpy as np
+
+from profiling import timed, interaction
+from prefetch import MonthPrefetcher
+from scheduler import scheduler
 
 class HomeScreenScrollList(MDGridLayout):
 	'''Holds scrollable content box on the home screen'''	
@@ -23,46 +28,87 @@ class HomeScreen(MDScreen):
 
 	dataset = ObjectProperty(None)
 
-	def plot_month_balance(self):
-		plot = self.scroll_content.balance_plot		
-		month_name = calendar.month_name[self.month]
-		idx = (self.each_day['month'] == month_name)
-		idx &= (self.each_day['year'] == self.year)
-
-		if self.month == 1:
-			idx_old = (self.each_day['month'] == calendar.month_name[12])
-			idx_old &= (self.each_day['year'] == (self.year-1))
-		else:
-			idx_old = (self.each_day['month'] == calendar.month_name[self.month-1])
-			idx_old &= (self.each_day['year'] == self.year)
-
-		x = self.each_day[idx]['day']
-		y = self.each_day[idx]['balance']
-		
-		xold = self.each_day[idx_old]['day']
-		yold = self.each_day[idx_old]['balance']
+	store = ObjectProperty(None, allownone = True)
+	'''Transactions indexed by date, None while the dataset is loading'''
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		# months next to the one shown are computed ahead of time
+		self.prefetcher = MonthPrefetcher(self.month_view)
+
+	def on_dataset_ready(self, app):
+		# month and year are only known once the screen has been entered
+		if hasattr(self, "month"):
+			self.on_month_select(self.month, self.year)
+
+	@staticmethod
+	def adjacent_month(year: int, month: int, step: int):
+		'''Returns the (year, month) `step` months away'''
+		index = year * 12 + (month - 1) + step
+		return index // 12, index % 12 + 1
+
+	def month_view(self, key):
+		'''
+		Returns the balance of the days of a month and of the month before,
+		and the summary figures of the month, for a key of
+		(store version, year, month). Returns None if the data has changed.
+		Runs on the prefetcher's worker thread too.
+		'''
+		version, year, month = key
+		store = self.store
+		if store is None or store.version != version:
+			return None
+		old_year, old_month = HomeScreen.adjacent_month(year, month, -1)
+		days = store.month(year, month, daily = True)
+		old_days = store.month(old_year, old_month, daily = True)
+		view = dict(
+			x       = days['day'].to_numpy(),
+			y       = days['balance'].to_numpy(),
+			xold    = old_days['day'].to_numpy(),
+			yold    = old_days['balance'].to_numpy(),
+			summary = store.summary.get(year, month),
+		)
+		# transactions added while filtering may have been missed
+		return view if store.version == version else None
 
-		plot.clear()
-		
-		plot.ax.plot(xold, yold, c = 'k', alpha=0.3, lw=2)
-		# plot.ax.fill_between(xold, yold, color = 'k', alpha=0.3)
-		plot.ax.plot(x, y, c = '#4285F4', lw=3)
-		# plot.ax.fill_between(x, y, color = '#4285F4', alpha=0.8)
-		
-		plot.ax.axis('off')
-		plot.ax.set_xticks([])
-		plot.ax.set_yticks([])
-		plot.ax.set_xlim(1, 31)
-		ymin = min(y.min() if len(y)>0 else 0, yold.min()) * 0.9
-		ymax = max(y.max() if len(y)>0 else 1, yold.max()) * 1.1
-		plot.ax.set_ylim(ymin, ymax)
-		ylines = np.linspace(ymin, ymax, num = 4)
-		for yl in ylines:
-			plot.ax.axhline(yl, ls=':', c='k', alpha=0.3)
+	def plot_month_balance(self, view):
+		plot = self.scroll_content.balance_plot
+		# months seen before are shown again without drawing
+		if plot.show_cached((self.year, self.month), self.store.version):
+			return
+		with timed("home.plot"):
+			self.update_balance_plot(plot, view['x'], view['y'], view['xold'], view['yold'])
+
+	def update_balance_plot(self, plot, x, y, xold, yold):
+		'''Shows the balance of the chosen month over that of the month before'''
+		if plot.get_artist('current') is None:
+			self.setup_balance_plot(plot)
+
+		plot.set_line_data('previous', xold, yold, autoscale = False)
+		plot.set_line_data('current', x, y, autoscale = False)
+
+		ymin = min(y.min() if len(y)>0 else 0, yold.min() if len(yold)>0 else 0) * 0.9
+		ymax = max(y.max() if len(y)>0 else 1, yold.max() if len(yold)>0 else 1) * 1.1
+		plot.set_ylim(ymin, ymax)
+		for i in range(4):
+			yl = ymin + i * (ymax - ymin) / 3
 			if yl > 1000: text = f"{yl/1000:.1f}k"
 			else:         text = f"{yl:.1f}"
-			plot.ax.annotate(text=text, xy=[1, yl], alpha=0.5, fontsize=9)
-		plot.show()
+			plot.set_guide(f"guide_{i}", yl)
+			plot.set_label(f"guide_label_{i}", 1, yl, text)
+		plot.show((self.year, self.month), self.store.version)
+
+	def setup_balance_plot(self, plot):
+		'''Creates the lines and guides of the balance plot, without data'''
+		plot.clear()
+		plot.add_line('previous', c = 'k', alpha=0.3, lw=2)
+		plot.add_line('current', c = '#4285F4', lw=3)
+
+		plot.hide_axes()
+		plot.set_xlim(1, 31)
+		for i in range(4):
+			plot.add_guide(f"guide_{i}", ls=':', c='k', alpha=0.3)
+			plot.add_label(f"guide_label_{i}", alpha=0.5, fontsize=9)
 
 
 	def on_month_select(self, month, year, *largs):
@@ -70,27 +116,49 @@ class HomeScreen(MDScreen):
 			return
 		self.month = month
 		self.year = year
+		interaction("home.month_select")
 		month_name = calendar.month_name[month]
 		self.topbar.title = f"{month_name} {year}"	
-		self.plot_month_balance()
+		version = self.store.version if self.store is not None else None
+		scheduler.request(self, self.refresh, (year, month, version))
 
-		idx = (self.dataset['month'] == month_name)
-		idx &= (self.dataset['year'] == self.year)
+	def refresh(self):
+		'''Shows the plot and figures of the chosen month'''
+		if self.store is None:
+			# placeholders stay until the dataset is ready
+			return
+		month, year = self.month, self.year
+
+		key = (self.store.version, year, month)
+		view = self.prefetcher.get(key)
+		if view is None:
+			with timed("home.filter"):
+				view = self.month_view(key)
+		if view is None:
+			# the transactions changed while filtering, show the new ones next frame
+			scheduler.invalidate(self)
+			scheduler.request(self, self.refresh, (year, month, self.store.version))
+			return
+		self.plot_month_balance(view)
 
-		print(self.dataset[idx]['income'])
-		balances_row = self.dataset[idx]['balance']
-		balance = 0 if balances_row.shape[0] == 0 else balances_row.iloc[-1]
-		income  = self.dataset[idx]['income'].sum()
-		expense = self.dataset[idx]['expense'].sum()
+		summary = view['summary']
+		balance = summary['balance']
+		income  = summary['income']
+		expense = summary['expense']
 		cash_flow = income - expense
 		
 		self.scroll_content.ids.balance_label.text   = f"£{balance:.2f}"
 		self.scroll_content.ids.cash_flow_label.text = f"£{cash_flow:.2f}"
 		self.scroll_content.ids.income_label.text    = f"£{income:.2f}"
 		self.scroll_content.ids.expenses_label.text  = f"£{expense:.2f}"
+
+		# most of the time the next month chosen is one of these
+		self.prefetcher.prefetch([(self.store.version, *HomeScreen.adjacent_month(year, month, step))
+			for step in (-1, 1)])
 		
 
 	def on_month_dialog(self):
+		from monthpicker import MonthPicker
 		self.month_dialog = MonthPicker(
 			on_date_select = self.on_month_select,
 			month = self.month,
@@ -110,5 +178,6 @@ class HomeScreen(MDScreen):
 		self.month = now.month
 		self.year = now.year
 	
+		# nothing is drawn again if the month and data are the ones shown
 		KivyClock.schedule_once( partial(self.on_month_select, now.month, now.year), 0)
 
@@ -0,0 +1,29 @@
+from kivy.uix.label import Label
+from kivy.clock import Clock
+from kivy.properties import NumericProperty
+
+from profiling import profiler
+
+
+class PerfOverlay(Label):
+	'''
+	Debug overlay with the frames per second and the time taken
+	by each step of the last interaction, shown with `--perf`.
+	'''
+
+	refresh_interval = NumericProperty(0.5)
+	'''Seconds between updates of the text'''
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.event = Clock.schedule_interval(self.refresh, self.refresh_interval)
+
+	def refresh(self, *largs):
+		lines = [f"{Clock.get_fps():.0f} FPS"]
+		name, elapsed, steps = profiler.last_interaction()
+		if name:
+			lines.append(f"{name}: {elapsed:.1f} ms")
+			for step, ms, count in steps:
+				times = f" x{count}" if count > 1 else ""
+				lines.append(f"  {step}{times}: {ms:.1f} ms")
+		self.text = "\n".join(lines)
@@ -0,0 +1,72 @@
+from kivy.logger import Logger
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+
+class MonthPrefetcher():
+	'''
+	Computes on a worker thread what a screen would show for the months
+	it is likely to show next, so that they are served from memory.
+
+	Results are kept in a small cache, dropping the least recently used.
+	A new call to `prefetch` cancels the previous one, so only the
+	neighbours of the latest selection are computed.
+
+	Parameters
+	----------
+		compute:	(callable) Returns the result for a key, or None
+					if it can't be computed any more, e.g. the data changed.
+					It is called from the worker thread.
+		size:		(int) Number of results kept
+	'''
+
+	def __init__(self, compute: Callable, size: int = 6):
+		self.compute = compute
+		self.size = size
+		self.cache = OrderedDict()
+		self.lock = threading.Lock()
+		self.generation = 0
+
+	def get(self, key: Hashable):
+		'''Returns the result for a key if it's been computed, or None'''
+		with self.lock:
+			value = self.cache.get(key)
+			if value is not None:
+				self.cache.move_to_end(key)
+			return value
+
+	def put(self, key: Hashable, value):
+		with self.lock:
+			self.cache[key] = value
+			self.cache.move_to_end(key)
+			while len(self.cache) > self.size:
+				self.cache.popitem(last = False)
+
+	def prefetch(self, keys: List[Hashable]):
+		'''Computes the results of keys that aren't cached, in the background'''
+		self.cancel()
+		with self.lock:
+			missing = [key for key in keys if key not in self.cache]
+		if missing:
+			threading.Thread(target = self.run,
+				args = (self.generation, missing), daemon = True).start()
+
+	def cancel(self):
+		'''Stops computing the keys of the last prefetch'''
+		self.generation += 1
+
+	def run(self, generation: int, keys: List[Hashable]):
+		for key in keys:
+			if generation != self.generation:
+				# the selection has changed since
+				return
+			try:
+				value = self.compute(key)
+			except Exception:
+				# the key is computed again when it is shown
+				Logger.exception(f"MonthPrefetcher: could not compute {key}")
+				continue
+			if value is not None and generation == self.generation:
+				self.put(key, value)
@@ -0,0 +1,134 @@
+'''
+Opt-in timing of the app's hot paths.
+
+Code is wrapped with `timed`, either as a context manager or as a decorator:
+
+	with timed("home.filter"):
+		days = store.month(year, month)
+
+	@timed("store.build")
+	def build_store(data): ...
+
+Timings are only taken once `profiler.enable()` has been called, which
+`python app.py -- --perf` does, so they cost a flag check otherwise.
+The most recent ones are kept in a ring buffer and grouped by the user
+interaction that caused them, see `interaction`.
+'''
+import time
+import cProfile
+import functools
+from collections import deque
+from typing import List, NamedTuple, Tuple
+
+
+# Number of timings kept in memory
+RING_SIZE = 512
+
+
+class Timing(NamedTuple):
+	name: str
+	start: float
+	duration: float
+
+
+class Profiler():
+	'''
+	Records how long named steps take, keeping the most recent
+	ones in a ring buffer, and optionally runs cProfile for the session.
+
+	Parameters
+	----------
+		size:		(int) Number of timings kept
+	'''
+
+	def __init__(self, size: int = RING_SIZE):
+		self.enabled = False
+		self.timings = deque(maxlen = size)
+		self.interactions = deque(maxlen = size)
+		self.profile = None
+		self.profile_path = None
+
+	def enable(self):
+		self.enabled = True
+
+	def start_interaction(self, name: str):
+		'''Groups the timings that follow under a new user interaction'''
+		if self.enabled:
+			self.interactions.append((name, time.perf_counter()))
+
+	def record(self, name: str, start: float, duration: float):
+		# deque.append is thread safe, so workers may record timings too
+		self.timings.append(Timing(name, start, duration))
+
+	def last_interaction(self) -> Tuple[str, float, List[Tuple[str, float, int]]]:
+		'''
+		Returns the name of the last interaction, the milliseconds from its
+		start to the end of its last step, and its steps as
+		(name, total milliseconds, count) in the order they finished.
+		Steps may be nested, so their times don't add up to the elapsed time.
+		'''
+		if not self.interactions:
+			return "", 0.0, []
+		name, started = self.interactions[-1]
+		steps = dict()
+		finished = started
+		for timing in list(self.timings):
+			if timing.start < started:
+				continue
+			total, count = steps.get(timing.name, (0.0, 0))
+			steps[timing.name] = (total + timing.duration * 1e3, count + 1)
+			finished = max(finished, timing.start + timing.duration)
+		steps = [(step, total, count) for step, (total, count) in steps.items()]
+		return name, (finished - started) * 1e3, steps
+
+	def start_profile(self, path: str):
+		'''Runs cProfile on the calling thread until `stop_profile`'''
+		self.profile_path = path
+		self.profile = cProfile.Profile()
+		self.profile.enable()
+
+	def stop_profile(self):
+		'''Stops cProfile and writes its statistics to the file given on start'''
+		if self.profile is None:
+			return
+		self.profile.disable()
+		self.profile.dump_stats(self.profile_path)
+		self.profile = None
+
+
+profiler = Profiler()
+
+
+def interaction(name: str):
+	'''Marks the start of a user interaction, see Profiler.start_interaction'''
+	profiler.start_interaction(name)
+
+
+class timed():
+	'''
+	Records the time taken by a block, or by every call of a function
+	when used as a decorator, under `name`.
+	'''
+
+	def __init__(self, name: str):
+		self.name = name
+		self.start = None
+
+	def __enter__(self):
+		if profiler.enabled:
+			self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info):
+		if self.start is not None:
+			profiler.record(self.name, self.start, time.perf_counter() - self.start)
+			self.start = None
+		return False
+
+	def __call__(self, func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			# a new instance per call, so that calls may nest or overlap
+			with timed(self.name):
+				return func(*args, **kwargs)
+		return wrapper
@@ -0,0 +1,44 @@
+from kivy.clock import Clock
+
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class RefreshScheduler():
+	'''
+	Runs the refreshes of views, such as a plot or a list, at most once
+	per frame. A view asking to be refreshed several times before the
+	next frame is only refreshed once, for the last request.
+
+	Each request comes with the inputs the view depends on, e.g.
+	the selection and the version of the data. A view isn't refreshed
+	when its inputs are the same as the last time it was.
+	'''
+
+	def __init__(self):
+		# view : (refresh, inputs) of the requests since the last frame
+		self.pending = OrderedDict()
+		# view : inputs of its last refresh
+		self.refreshed = dict()
+		self.trigger = Clock.create_trigger(self.flush)
+
+	def request(self, view: Hashable, refresh: Callable, inputs: Hashable):
+		'''Marks a view dirty, so that `refresh` is called on the next frame'''
+		self.pending[view] = (refresh, inputs)
+		self.trigger()
+
+	def invalidate(self, view: Hashable):
+		'''Forgets the last refresh of a view, so the next request isn't skipped'''
+		self.refreshed.pop(view, None)
+
+	def flush(self, *largs):
+		pending, self.pending = self.pending, OrderedDict()
+		for view, (refresh, inputs) in pending.items():
+			if view in self.refreshed and self.refreshed[view] == inputs:
+				# already showing these inputs
+				continue
+			self.refreshed[view] = inputs
+			refresh()
+
+
+scheduler = RefreshScheduler()
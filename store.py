@@ -0,0 +1,211 @@
+import datetime as dt
+import itertools
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from dataset import concat_datasets
+
+
+Date = Union[dt.date, dt.datetime, np.datetime64, pd.Timestamp, str]
+
+# Versions of the transactions held by any store, see TransactionStore.version
+VERSIONS = itertools.count(1)
+
+
+class TransactionStore():
+	'''
+	Holds the cleaned transactions sorted by date, so that the rows
+	of a given day, month or year are found with a binary search
+	and returned as a slice instead of scanning every row.
+
+	Two tables are kept:
+		data:		every transaction, oldest first.
+		each_day:	the last transaction of each day, which holds
+					the balance at the end of that day.
+
+	`version` changes whenever the transactions do, and is never
+	shared by two stores, so it can key anything derived from them.
+
+	Parameters
+	----------
+		dataset:	(pd.DataFrame) Transactions as returned by
+					`TransactionDatabase.load`, newest first.
+	'''
+
+	def __init__(self, dataset: pd.DataFrame):
+		self.set_data(TransactionStore.sort(dataset))
+		self.summary = MonthlySummary(self)
+
+	@staticmethod
+	def sort(dataset: pd.DataFrame) -> pd.DataFrame:
+		# bank exports list the newest transactions first, so reversing them
+		# before a stable sort keeps transactions of the same day in order.
+		return dataset.iloc[::-1].sort_values(
+			'datetime', kind='stable').reset_index(drop=True)
+
+	def set_data(self, data: pd.DataFrame):
+		'''Replaces the transactions, which must already be sorted by date'''
+		self.data = data
+		self.version = next(VERSIONS)
+		self.each_day = self.data.drop_duplicates(
+			subset=['datetime'], keep='last').reset_index(drop=True)
+
+		self.keys = self.data['datetime'].to_numpy()
+		self.day_keys = self.each_day['datetime'].to_numpy()
+
+	def append(self, dataset: pd.DataFrame):
+		'''
+		Adds newly imported transactions and updates the monthly summary
+		of the months they belong to. `dataset` holds every transaction of
+		the days it covers, as `TransactionDatabase.import_files` returns,
+		and replaces the stored transactions of those days.
+		New transactions are usually more recent than the stored ones,
+		in which case they are appended without sorting every row again
+		and only the days from the first new one onwards are recomputed.
+		'''
+		if dataset.shape[0] == 0:
+			return
+		new_rows = TransactionStore.sort(dataset)
+		first = new_rows['datetime'].iloc[0]
+
+		if len(self.data) == 0 or first >= self.data['datetime'].iloc[-1]:
+			# the last day stored may have gained transactions
+			lo = int(np.searchsorted(self.keys, first.to_datetime64(), side='left'))
+			start = int(np.searchsorted(self.day_keys, first.to_datetime64(), side='left'))
+			self.data = concat_datasets([self.data.iloc[:lo], new_rows])
+			self.keys = self.data['datetime'].to_numpy()
+			new_days = new_rows.drop_duplicates(subset=['datetime'], keep='last')
+			self.each_day = concat_datasets([self.each_day.iloc[:start], new_days])
+			self.day_keys = self.each_day['datetime'].to_numpy()
+			self.version = next(VERSIONS)
+		else:
+			kept = self.data[~self.data['datetime'].isin(new_rows['datetime'])]
+			data = concat_datasets([kept, new_rows])
+			self.set_data(data.sort_values('datetime', kind='stable').reset_index(drop=True))
+
+		months = new_rows['datetime'].dt.to_period('M').unique()
+		self.summary.update((p.year, p.month) for p in months)
+
+	def __len__(self):
+		return len(self.data)
+
+	@staticmethod
+	def to_day(date: Date) -> np.datetime64:
+		if isinstance(date, str):
+			date = dt.datetime.strptime(date, "%d/%m/%Y")
+		return np.datetime64(pd.Timestamp(date).date(), 'D')
+
+	def between(self, start: Date, stop: Date, daily: bool = False) -> pd.DataFrame:
+		'''
+		Returns the transactions from the day `start` up to,
+		but not including, the day `stop`.
+		If `daily` is True, only the last transaction of each day is returned.
+		'''
+		frame, keys = (self.each_day, self.day_keys) if daily else (self.data, self.keys)
+		lo = np.searchsorted(keys, TransactionStore.to_day(start), side='left')
+		hi = np.searchsorted(keys, TransactionStore.to_day(stop), side='left')
+		return frame.iloc[lo:hi]
+
+	def day(self, date: Date) -> pd.DataFrame:
+		'''Returns the transactions made on a given day'''
+		start = TransactionStore.to_day(date)
+		return self.between(start, start + np.timedelta64(1, 'D'))
+
+	def month(self, year: int, month: int, daily: bool = False) -> pd.DataFrame:
+		'''Returns the transactions of a month, where January is 1'''
+		start = np.datetime64(f"{int(year):04d}-{int(month):02d}", 'M')
+		stop = start + np.timedelta64(1, 'M')
+		return self.between(start, stop, daily = daily)
+
+	def year(self, year: int, daily: bool = False) -> pd.DataFrame:
+		'''Returns the transactions of a year'''
+		start = np.datetime64(f"{int(year):04d}", 'Y')
+		stop = start + np.timedelta64(1, 'Y')
+		return self.between(start, stop, daily = daily)
+
+	def years(self) -> list:
+		'''Returns the years that hold any transactions, in order'''
+		return sorted(int(y) for y in self.data['year'].unique())
+
+
+def transaction_records(rows: pd.DataFrame) -> List[dict]:
+	'''
+	Returns the description and amount of each transaction as dicts,
+	reading each column once instead of building a Series per row.
+	'''
+	names = rows['Transaction Description'].astype(object).fillna("").tolist()
+	amounts = rows['amount'].tolist()
+	return [dict(name = n, amount = a) for n, a in zip(names, amounts)]
+
+
+class MonthlySummary():
+	'''
+	Aggregated figures of each month, so that showing the summary
+	of a month is a dictionary lookup rather than a filter and sum.
+
+	Each month, keyed by (year, month), holds:
+		balance:		balance after the last transaction of the month
+		income:			total money received
+		expense:		total money spent
+		count:			number of transactions
+		min_balance:	lowest balance reached during the month
+		max_balance:	highest balance reached during the month
+
+	Parameters
+	----------
+		store:		(TransactionStore) Transactions to aggregate
+	'''
+
+	EMPTY = dict(balance = 0.0, income = 0.0, expense = 0.0,
+		count = 0, min_balance = 0.0, max_balance = 0.0)
+
+	def __init__(self, store: TransactionStore):
+		self.store = store
+		self.months = dict()
+		self.compute()
+
+	@staticmethod
+	def aggregate(data: pd.DataFrame) -> pd.DataFrame:
+		'''Returns one row of figures per (year, month) of the given data'''
+		dates = data['datetime'].dt
+		# sum amounts in double precision
+		data = data[['balance', 'income', 'expense']].astype(np.float64)
+		groups = data.groupby([dates.year.rename('y'), dates.month.rename('m')], sort=False)
+		return groups.agg(
+			balance     = ('balance', 'last'),
+			income      = ('income',  'sum'),
+			expense     = ('expense', 'sum'),
+			count       = ('balance', 'size'),
+			min_balance = ('balance', 'min'),
+			max_balance = ('balance', 'max'),
+		)
+
+	def compute(self):
+		'''Aggregates every month from scratch'''
+		table = MonthlySummary.aggregate(self.store.data)
+		self.months = {
+			(int(y), int(m)) : MonthlySummary.to_dict(row)
+			for (y,m), row in zip(table.index, table.itertuples(index=False))
+		}
+
+	def update(self, months):
+		'''Aggregates again only the given (year, month) pairs'''
+		for year, month in months:
+			data = self.store.month(year, month)
+			if data.shape[0] == 0:
+				self.months.pop((year, month), None)
+				continue
+			row = next(MonthlySummary.aggregate(data).itertuples(index=False))
+			self.months[(year, month)] = MonthlySummary.to_dict(row)
+
+	@staticmethod
+	def to_dict(row) -> dict:
+		figures = {name : float(value) for name, value in row._asdict().items()}
+		figures['count'] = int(figures['count'])
+		return figures
+
+	def get(self, year: int, month: int) -> dict:
+		'''Returns the figures of a month, which are zero if it has no data'''
+		return self.months.get((int(year), int(month)), dict(MonthlySummary.EMPTY))
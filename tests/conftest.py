@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the app's modules and the synthetic exports of the benchmarks
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
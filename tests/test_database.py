@@ -0,0 +1,21 @@
+import os
+
+import numpy as np
+
+from database import TransactionDatabase
+from synthetic import generate_bank_export
+
+
+def test_import_blank_fields(tmp_path):
+	'''Rows with blank text or amounts are imported, and only once'''
+	export = generate_bank_export(50)
+	export.loc[3, 'Transaction Description'] = np.nan
+	export.loc[5, 'Transaction Type'] = np.nan
+	export.loc[7, 'Balance'] = np.nan
+	path = os.path.join(tmp_path, "export.csv")
+	export.to_csv(path, index = False)
+
+	database = TransactionDatabase(os.path.join(tmp_path, "transactions.db"))
+	assert database.import_csv(path) == 50
+	assert database.import_csv(path) == 0
+	assert database.count() == 50
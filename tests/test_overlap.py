@@ -0,0 +1,74 @@
+'''
+Importing bank exports whose dates overlap must give the same balance at
+the end of each day, and the same monthly summary, as a single export of
+the whole period, whichever order the exports are imported in.
+'''
+import os
+
+import numpy as np
+import pytest
+
+from database import TransactionDatabase
+from store import TransactionStore
+from synthetic import generate_bank_export
+
+
+ROWS = 3000
+
+PARTS = 4
+
+
+def split_export(export, rng, parts: int):
+	'''
+	Splits an export, newest first, into `parts` exports that overlap.
+	They may start and end in the middle of a day, so a day's
+	transactions can be split across exports.
+	'''
+	cuts = np.sort(rng.choice(np.arange(2, len(export) - 1), parts - 1, replace = False))
+	exports = []
+	for i in range(parts):
+		# newest row of the export, somewhere in the previous export
+		end = 0 if i == 0 else int(rng.integers(cuts[i - 1] // 2, cuts[i - 1]))
+		start = len(export) if i == parts - 1 else int(cuts[i])
+		exports.append(export.iloc[end:start])
+	return exports
+
+
+def assert_same_days(store: TransactionStore, reference: TransactionStore):
+	a, b = store.each_day, reference.each_day
+	assert np.array_equal(a['datetime'].to_numpy(), b['datetime'].to_numpy())
+	assert np.allclose(a['balance'].to_numpy(), b['balance'].to_numpy())
+	assert store.summary.months == reference.summary.months
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("order", ["oldest first", "newest first", "shuffled"])
+def test_overlapping_imports(tmp_path, seed, order):
+	rng = np.random.default_rng(seed)
+	export = generate_bank_export(ROWS, seed = seed, per_day = 6.0)
+	exports = split_export(export, rng, PARTS)
+
+	path = os.path.join(tmp_path, "combined.csv")
+	export.to_csv(path, index = False)
+	reference = TransactionStore(
+		TransactionDatabase(os.path.join(tmp_path, "combined.db")).import_files([path]))
+
+	indices = {
+		"oldest first": reversed(range(PARTS)),
+		"newest first": range(PARTS),
+		"shuffled": rng.permutation(PARTS),
+	}[order]
+	database = TransactionDatabase(os.path.join(tmp_path, "split.db"))
+	store = None
+	for i in indices:
+		path = os.path.join(tmp_path, f"export_{i}.csv")
+		exports[i].to_csv(path, index = False)
+		new_rows = database.import_files([path])
+		# as the app adds the exports found while it is running
+		if store is None:
+			store = TransactionStore(new_rows)
+		else:
+			store.append(new_rows)
+
+	assert_same_days(TransactionStore(database.load()), reference)
+	assert_same_days(store, reference)
@@ -0,0 +1,89 @@
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+import threading
+from functools import partial
+from typing import Callable
+
+import dataset
+
+
+class DataFolderWatcher():
+	'''
+	Checks the data folder every few seconds for bank exports
+	that are new or have changed since they were imported.
+	Changed files are imported on a worker thread, and the transactions
+	that were not in the database yet are handed to `on_import`
+	on the UI thread.
+
+	Checking only compares the size and modification time of the csv files
+	against those recorded by the database, so it is cheap enough to poll.
+	A file is only imported once they stay the same across two checks,
+	so that exports still being downloaded or copied aren't read half written.
+	A file that fails to import is tried again once it changes.
+
+	Parameters
+	----------
+		database:	(database.TransactionDatabase) Database to import into
+		on_import:	(callable) Called with a dataframe of the new transactions
+		data_dir:	(str) Folder holding the bank exports
+		interval:	(float) Seconds between checks
+	'''
+
+	def __init__(self, database, on_import: Callable,
+			data_dir: str = dataset.DATA_DIR, interval: float = 5.0):
+		self.database = database
+		self.on_import = on_import
+		self.data_dir = data_dir
+		self.interval = interval
+		self.event = None
+		self.busy = False
+		# path : (size, modification time) of the changed files on the last
+		# check, and of the files that failed to import
+		self.seen = dict()
+		self.failed = dict()
+
+	def start(self):
+		if self.event is None:
+			self.event = Clock.schedule_interval(self.poll, self.interval)
+
+	def stop(self):
+		if self.event is not None:
+			self.event.cancel()
+			self.event = None
+
+	def poll(self, *largs):
+		# an import still running will pick up the files on the next check
+		if self.busy:
+			return
+		try:
+			paths = self.database.changed_files(self.database.csv_files(self.data_dir))
+			stats = {path : self.database.file_stat(path) for path in paths}
+		except OSError:
+			# a file may be removed while it is being checked
+			return
+		ready = {path : stat for path, stat in stats.items()
+			if self.seen.get(path) == stat and self.failed.get(path) != stat}
+		self.seen = stats
+		if not ready:
+			return
+		self.busy = True
+		threading.Thread(target = self.import_files, args = (ready,), daemon = True).start()
+
+	def import_files(self, stats: dict):
+		'''Imports the files on a worker thread'''
+		paths = list(stats)
+		try:
+			new_rows = self.database.import_files(paths)
+		except Exception:
+			Logger.exception(f"DataFolderWatcher: could not import {paths}")
+			Clock.schedule_once(partial(self.finish, None, stats), 0)
+			return
+		Clock.schedule_once(partial(self.finish, new_rows, dict()), 0)
+
+	def finish(self, new_rows, failed: dict, *largs):
+		self.busy = False
+		self.failed.update(failed)
+		if new_rows is not None and new_rows.shape[0] > 0:
+			Logger.info(f"DataFolderWatcher: imported {new_rows.shape[0]} new transactions")
+			self.on_import(new_rows)